@@ -1,107 +1,320 @@
+import io
 import os
-import uvicorn
+import importlib
 import traceback
 import threading
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, UploadFile, Form, Request
-from typing import Dict, Any, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from fastapi import FastAPI, UploadFile, Form, Request, BackgroundTasks
+from typing import Callable, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, FIRST_COMPLETED, wait
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_google_genai import GoogleGenerativeAI
+from fastapi.responses import Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+
+# Before the local imports: several modules read their settings from the
+# environment at import time, and .env must already be applied
+load_dotenv()
+
 import helper_function
+import metrics
+import admission
+import model_router
+import single_flight
+import hedging
+import prerender
+import job_fetcher
+import key_pool
+import checkpoints
 
 # -----------------------------------
 # Auto-Restart Function with Timeout
 # -----------------------------------
-def safe_gemini_call_with_auto_restart(model, parser, prompt, timeout_seconds=60) -> Tuple[Optional[Any], Optional[Dict]]:
+def safe_gemini_call_with_auto_restart(model_name: str, parser, prompt, timeout_seconds=60, stage="llm") -> Tuple[Optional[Any], Optional[Dict]]:
     """
     Execute Gemini API call with auto-restart on quota exceeded.
+    The client (and API key) for model_name is picked per call by invoke_with_key_pool.
     Returns (result, error_dict) where error_dict contains restart information.
     """
-    restart_timer = None
+    def call(target_name, primary=False):
+        """Invoke a model and parse its output, recording latency, tokens and outcome"""
+        if primary:
+            # Time spent queued for an executor thread is not a hang: the
+            # restart timer and the wait timeout start with the call itself
+            restart_timer.start()
+            started.set()
+        ok = False
+        try:
+            with metrics.track_stage(stage, target_name):
+                output = invoke_with_key_pool(target_name, prompt, stage)
+                metrics.record_tokens(stage, target_name, prompt, output)
+                result = parser.parse(output)
+            ok = True
+            return result
+        finally:
+            metrics.record_outcome(target_name, ok)
+    
+    def wait_for_result(primary, timeout):
+        """Result of the primary call, hedged with a backup call once it runs past the stage threshold"""
+        deadline = time.monotonic() + timeout
+        delay = hedging.hedge_delay(stage, model_name)
+        if delay is None or delay >= timeout:
+            return primary.result(timeout=timeout)
+
+        wait([primary], timeout=delay)
+        if primary.done():
+            hedging.record_unhedged()
+            return primary.result()
+        if not hedging.try_hedge(stage):
+            return primary.result(timeout=deadline - time.monotonic())
+
+        backup_name = hedging.backup_model(stage, model_name)
+        print(f"🔀 {stage} still running after {delay:.1f}s - sending backup call to {backup_name}")
+        metrics.record_retry(stage, backup_name, "hedge")
+        backup = llm_executor.submit(call, backup_name)
+
+        # First valid parsed result wins; the loser is cancelled if it has not started, ignored otherwise
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError()
+            for finished in done:
+                if finished.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    winner = "backup_won" if finished is backup else "primary_won"
+                    metrics.inc("llm_hedges_total", stage=stage, result=winner)
+                    return finished.result()
+        metrics.inc("llm_hedges_total", stage=stage, result="both_failed")
+        return primary.result()
     
     def force_restart():
         """Force restart after timeout"""
+        if SUPERVISOR_STATUS_FD >= 0:
+            # Under run_server.py: the standby takes over and this worker drains
+            print(f"🔄 Timeout reached ({timeout_seconds}s) - asking the supervisor for a graceful restart...")
+            os.write(SUPERVISOR_STATUS_FD, b"restart\n")
+            return
         print(f"🔄 Timeout reached ({timeout_seconds}s) - Auto-restarting server...")
         os._exit(42)  # Exit code 42 signals quota restart
     
+    restart_timer = threading.Timer(timeout_seconds, force_restart)
+    started = threading.Event()
+
     try:
-        # Start timeout timer
-        restart_timer = threading.Timer(timeout_seconds, force_restart)
-        restart_timer.start()
-        
-        # Execute with executor timeout
-        with ThreadPoolExecutor() as executor:
-            future = executor.submit(parser.parse, model.invoke(prompt))
-            print("⏳ Waiting for Gemini response...")
-
-            try:
-                result = future.result(timeout=timeout_seconds-5)  # 5s buffer
-                restart_timer.cancel()
-                return result, None
-            except TimeoutError:
-                print(f"⏰ Executor timeout - forcing restart...")
-                restart_timer.cancel()
-                force_restart()
+        # Execute with executor timeout, counted from when a worker picks the call up
+        future = llm_executor.submit(call, model_name, True)
+        print("⏳ Waiting for Gemini response...")
+        started.wait()
+
+        try:
+            result = wait_for_result(future, timeout_seconds-5)  # 5s buffer
+            restart_timer.cancel()
+            return result, None
+        except TimeoutError:
+            print(f"⏰ Executor timeout - forcing restart...")
+            restart_timer.cancel()
+            force_restart()
+            # Only reached when supervised: this request fails, the next ones go to a fresh worker
+            error = classify_gemini_error(Exception(f"Gemini call timed out after {timeout_seconds - 5}s (rate limit likely)"))
+            metrics.record_error(error["error_type"], stage, model_name)
+            return None, error
                 
     except Exception as e:
-        if restart_timer:
-            restart_timer.cancel()
+        restart_timer.cancel()
             
-        error_message = str(e).lower()
         print(f"❌ Error in Gemini call: {e}")
-        
-        # Check for JSON parsing errors (empty response, invalid JSON)
-        if ("invalid json" in error_message or 
-            "expecting value" in error_message or 
-            "json.decoder.jsondecodererror" in error_message or
-            "char 0" in error_message):
-            print("🔍 JSON parsing error detected - likely empty or malformed API response")
-            print("🔄 Returning error to frontend for server switching instead of auto-restart")
-            # Cancel any pending restart timer since we're handling this gracefully
-            if restart_timer and restart_timer.is_alive():
-                restart_timer.cancel()
-                print("⏹️ Cancelled auto-restart timer - letting frontend handle server switch")
-            return None, {
-                "error_type": "api_response_error",
-                "message": "API returned invalid response. This may indicate quota limits or API issues.",
-                "original_error": str(e),
-                "auto_restart": True,
-                "restart_reason": "invalid_response",
-                "server_switch_recommended": True,
-                "alternative_servers": ["gemini-2.5-flash", "gemini-2.0-flash"],
-                "estimated_restart_time": "30 seconds",
-                "suggestion": "Please switch to a different server. This error typically indicates quota limits."
-            }
-        
-        # Check for quota/rate limit errors
-        if ("quota" in error_message or "limit" in error_message or "resource" in error_message or
-            "rate limit" in error_message or "too many requests" in error_message):
-            print("🚨 Quota/rate limit error detected")
-            print("🔄 Returning error to frontend for server switching")
-            # Cancel any pending restart timer since we're handling this gracefully
-            if restart_timer and restart_timer.is_alive():
-                restart_timer.cancel()
-                print("⏹️ Cancelled auto-restart timer - letting frontend handle server switch")
-            return None, {
-                "error_type": "quota_exceeded",
-                "message": "Server quota exceeded. Please switch to a different server.",
-                "original_error": str(e),
-                "auto_restart": True,
-                "restart_reason": "quota_exceeded",
-                "server_switch_recommended": True,
-                "alternative_servers": ["gemini-2.5-flash", "gemini-2.0-flash"],
-                "estimated_restart_time": "30 seconds",
-                "suggestion": "Please switch to a different server. The current server has reached its quota limit."
-            }
-        else:
-            return None, {
-                "error_type": "general_error",
-                "message": str(e),
-                "original_error": str(e)
-            }
+        error = classify_gemini_error(e)
+        metrics.record_error(error["error_type"], stage, model_name)
+        return None, error
+
+# Identical (model, prompt) calls already waiting on Gemini are shared, not repeated
+llm_single_flight = single_flight.SingleFlight("llm")
+# Requests carrying the same idempotency key are run once
+checkpoint_flight = single_flight.SingleFlight("idempotency_key")
+
+def coalesced_gemini_call(model_name: str, parser, prompt, timeout_seconds=60, stage="llm") -> Tuple[Optional[Any], Optional[Dict]]:
+    """safe_gemini_call_with_auto_restart, merged with any identical call already in flight"""
+    key = (model_name, single_flight.prompt_fingerprint(prompt))
+    return llm_single_flight.do(
+        key, lambda: safe_gemini_call_with_auto_restart(model_name, parser, prompt, timeout_seconds, stage))
+
+def invoke_with_key_pool(model_name: str, prompt, stage: str):
+    """Invoke a model with the API key that has the most headroom, moving to another key on quota errors"""
+    tokens = metrics.estimate_tokens(prompt)
+    tried = set()
+    while True:
+        key_index = key_pool.pool.acquire(model_name, tokens, exclude=tried)
+        try:
+            output = get_model(model_name, key_pool.pool.keys[key_index]).invoke(prompt)
+        except Exception as e:
+            if not is_key_quota_error(e):
+                # Timeouts, bad requests, parse errors: not the key's fault, leave the pool alone
+                raise
+            key_pool.pool.quarantine(key_index, model_name)
+            tried.add(key_index)
+            if len(tried) >= key_pool.pool.size:
+                raise
+            metrics.record_retry(stage, model_name, "api_key_quota")
+            continue
+        key_pool.pool.add_tokens(key_index, model_name, metrics.estimate_tokens(output))
+        return output
+
+def is_quota_error(e: Exception) -> bool:
+    error_message = str(e).lower()
+    return ("quota" in error_message or "limit" in error_message or "resource" in error_message or
+            "rate limit" in error_message or "too many requests" in error_message)
+
+def is_key_quota_error(e: Exception) -> bool:
+    """A 429 / ResourceExhausted from the API: the key's quota ran out, another key may still work"""
+    while e is not None:
+        # google.api_core errors carry their HTTP status as .code, HTTP clients as .status_code
+        if getattr(e, "code", None) == 429 or getattr(e, "status_code", None) == 429:
+            return True
+        if type(e).__name__ in ("ResourceExhausted", "TooManyRequests"):
+            return True
+        e = e.__cause__
+    return False
+
+def classify_gemini_error(e: Exception) -> Dict:
+    """Map an exception from a Gemini call to the error dict returned to the frontend"""
+    error_message = str(e).lower()
+    
+    # Check for JSON parsing errors (empty response, invalid JSON)
+    if ("invalid json" in error_message or 
+        "expecting value" in error_message or 
+        "json.decoder.jsondecodererror" in error_message or
+        "char 0" in error_message):
+        print("🔍 JSON parsing error detected - likely empty or malformed API response")
+        print("🔄 Returning error to frontend for server switching instead of auto-restart")
+        return {
+            "error_type": "api_response_error",
+            "message": "API returned invalid response. This may indicate quota limits or API issues.",
+            "original_error": str(e),
+            "auto_restart": True,
+            "restart_reason": "invalid_response",
+            "server_switch_recommended": True,
+            "alternative_servers": ["gemini-2.5-flash", "gemini-2.0-flash"],
+            "estimated_restart_time": "30 seconds",
+            "suggestion": "Please switch to a different server. This error typically indicates quota limits."
+        }
+    
+    # Check for quota/rate limit errors
+    if is_quota_error(e):
+        print("🚨 Quota/rate limit error detected")
+        print("🔄 Returning error to frontend for server switching")
+        return {
+            "error_type": "quota_exceeded",
+            "message": "Server quota exceeded. Please switch to a different server.",
+            "original_error": str(e),
+            "auto_restart": True,
+            "restart_reason": "quota_exceeded",
+            "server_switch_recommended": True,
+            "alternative_servers": ["gemini-2.5-flash", "gemini-2.0-flash"],
+            "estimated_restart_time": "30 seconds",
+            "suggestion": "Please switch to a different server. The current server has reached its quota limit."
+        }
+    
+    return {
+        "error_type": "general_error",
+        "message": str(e),
+        "original_error": str(e)
+    }
+
+# -----------------------------------
+# Model Configuration
+# -----------------------------------
+# Set by run_server.py for its workers: pipe used to ask the supervisor for a graceful restart
+SUPERVISOR_STATUS_FD = int(os.getenv("SUPERVISOR_STATUS_FD", "-1"))
+
+# Pause between LLM stages to stay under per-minute rate limits
+STAGE_DELAY_SECONDS = float(os.getenv("STAGE_DELAY_SECONDS", "2"))
+
+# Optional "module:ClassName" replacing GoogleGenerativeAI, e.g. the benchmark
+# stand-in "benchmarks.fake_gemini:FakeGemini"
+LLM_CLIENT_FACTORY = os.getenv("LLM_CLIENT_FACTORY", "")
+
+# Shared pool for Gemini calls (instead of one executor per call)
+llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_WORKERS", "16")), thread_name_prefix="llm")
+# Waits on the chunk calls of chunked parsing; separate from llm_executor so
+# waiting threads never hold the slots the calls themselves need
+chunk_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_WORKERS", "16")), thread_name_prefix="chunk")
+# Chunk calls one request keeps in flight, so a single long document cannot
+# take every llm_executor thread from the other admitted analyses
+CHUNK_MAX_PARALLEL = int(os.getenv("PARSE_CHUNK_MAX_PARALLEL", "4"))
+
+# selectedServer form value -> Gemini model
+SERVER_MODELS = {
+    "server1": "gemini-2.5-pro",
+    "server2": "gemini-2.5-flash",
+    "server3": "gemini-2.0-flash",
+    # Pick a model per stage (see model_router.py)
+    "auto": model_router.AUTO,
+}
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+def build_model(model_name: str, api_key: Optional[str] = None):
+    """Create the LLM client used for a model name (and API key, see key_pool.py)"""
+    if LLM_CLIENT_FACTORY:
+        module_name, class_name = LLM_CLIENT_FACTORY.split(":")
+        client_class = getattr(importlib.import_module(module_name), class_name)
+    else:
+        # Imported here: langchain_google_genai is the slowest import of the app
+        from langchain_google_genai import GoogleGenerativeAI
+        client_class = GoogleGenerativeAI
+    if api_key:
+        return client_class(model=model_name, temperature=0.1, google_api_key=api_key)
+    return client_class(model=model_name, temperature=0.1)
+
+model_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+model_clients_lock = threading.Lock()
+
+def get_model(model_name: str, api_key: Optional[str] = None):
+    """Return the shared client for a model name and API key, creating it on first use"""
+    model = model_clients.get((model_name, api_key))
+    if model is None:
+        with model_clients_lock:
+            model = model_clients.get((model_name, api_key))
+            if model is None:
+                model = model_clients[(model_name, api_key)] = build_model(model_name, api_key)
+    return model
+
+# -----------------------------------
+# Startup Warm-Up and Readiness
+# -----------------------------------
+readiness: Dict[str, Any] = {"ready": False, "warmup_seconds": None, "warmup_errors": []}
+
+def warm_up():
+    """Load heavy modules, build prompt/schema objects and model clients before taking traffic"""
+    start_time = time.perf_counter()
+    errors = []
+    try:
+        helper_function.warm_up()
+    except Exception as e:
+        errors.append(f"templates: {e}")
+    model_names = (set(SERVER_MODELS.values()) | set(model_router.policy["candidates"]) | {DEFAULT_MODEL}) - {model_router.AUTO}
+    for model_name in sorted(model_names):
+        try:
+            for api_key in key_pool.pool.keys:
+                get_model(model_name, api_key)
+        except Exception as e:
+            errors.append(f"{model_name}: {e}")
+
+    readiness["warmup_seconds"] = round(time.perf_counter() - start_time, 3)
+    readiness["warmup_errors"] = errors
+    readiness["ready"] = True
+    print(f"🔥 Warm-up finished in {readiness['warmup_seconds']}s"
+          + (f" with {len(errors)} error(s): {errors}" if errors else ""))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: /api/health answers right away, /api/ready
+    # reports 503 until the heavy imports and clients are in place
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
 
 # -----------------------------------
 # FastAPI Application Setup
@@ -109,7 +322,8 @@ def safe_gemini_call_with_auto_restart(model, parser, prompt, timeout_seconds=60
 app = FastAPI(
     title="Resume Processing API",
     description="API for processing resumes and job descriptions with AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -120,7 +334,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-load_dotenv()
+# Set while a supervised worker hands over to its replacement (see run_server.py):
+# responses ask clients to reconnect, which moves keep-alive connections to the
+# new worker before this one stops
+draining = threading.Event()
+
+@app.middleware("http")
+async def close_connections_while_draining(request: Request, call_next):
+    response = await call_next(request)
+    if draining.is_set():
+        response.headers["Connection"] = "close"
+    return response
 
 # -----------------------------------
 # API Endpoints
@@ -135,6 +359,12 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/ready")
+async def ready():
+    """Readiness endpoint: 200 once warm-up has finished, 503 before"""
+    body = dict(readiness, timestamp=datetime.now().isoformat())
+    return JSONResponse(body, status_code=200 if readiness["ready"] else 503)
+
 @app.post("/api/restart-server")
 async def restart_server():
     """Restart server endpoint"""
@@ -173,12 +403,37 @@ async def server_status():
             "estimated_time": "30 seconds",
             "recommendation": "Switch to alternative server for immediate processing"
         },
+        "admission": admission.controller.status(),
+        "api_keys": key_pool.pool.status(),
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+def busy_response(e: admission.AdmissionRejected) -> JSONResponse:
+    """429 answer for a request that did not get an analysis slot"""
+    print(f"🚦 Rejecting analysis ({e.reason}), retry after {e.retry_after}s")
+    metrics.inc("resume_requests_total", result="rejected")
+    return JSONResponse(
+        {
+            "success": False,
+            "error": "Server is busy processing other resumes.",
+            "error_type": "server_busy",
+            "message": f"Server is busy. Please retry in {e.retry_after} seconds.",
+            "retry_after": e.retry_after,
+            "queue_depth": admission.controller.queue_depth
+        },
+        status_code=429,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @app.post("/api/process-resume")
 async def process_resume(
     request: Request,
+    background_tasks: BackgroundTasks,
     job_description: str = Form(""),
     resume: UploadFile = Form(None)
 ):
@@ -190,159 +445,353 @@ async def process_resume(
     
     # Server selection
     selected_server = form.get("selectedServer", "server2")
-    if selected_server == "server1":
-        model_name = "gemini-2.5-pro"
-    elif selected_server == "server2":
-        model_name = "gemini-2.5-flash"
-    else:
-        model_name = "gemini-2.0-flash"
+    model_name = SERVER_MODELS.get(selected_server, DEFAULT_MODEL)
 
-    model = GoogleGenerativeAI(model=model_name, temperature=0.1)
+    if not resume:
+        return {"success": False, "error": "No resume file provided"}
 
-    # Process resume file
-    if resume:
+    # Retries with the same key resume from checkpointed stages (see checkpoints.py)
+    idempotency_key = checkpoints.clean_key(request.headers.get("Idempotency-Key") or form.get("idempotencyKey"))
+
+    # Admission control: bounded concurrency and wait queue, 429 when full.
+    # request.form() above has already received the upload (Starlette spools
+    # files over 1 MB to disk); a rejected request skips only the analysis.
+    try:
+        await admission.controller.acquire()
+    except admission.AdmissionRejected as e:
+        return busy_response(e)
+
+    start_time = time.perf_counter()
+    try:
         resume_content = await resume.read()
-        resume_path = f"temp_{resume.filename}"
-        
-        with open(resume_path, "wb") as f:
-            f.write(resume_content)
-        
-        resume_text = helper_function.extract_text_from_pdf(resume_path)
-        os.remove(resume_path)
-    else:
-        return {"success": False, "error": "No resume file provided"}
-    # Parse resume
-    parser_resume, resume_prompt = helper_function.parse_resume_with_llm(resume_text)
-    res_resume, error = safe_gemini_call_with_auto_restart(model, parser_resume, resume_prompt)
-    
-    if error:
-        if error.get("auto_restart"):
-            return {
-                "success": False, 
-                "error": error["message"],
-                "error_type": "quota_exceeded",
-                "auto_restarting": True,
-                "restart_reason": error.get("restart_reason", "quota_exceeded"),
-                "server_switch_recommended": error.get("server_switch_recommended", True),
-                "alternative_servers": error.get("alternative_servers", ["gemini-2.5-flash", "gemini-2.0-flash"]),
-                "estimated_restart_time": error.get("estimated_restart_time", "30 seconds"),
-                "suggestion": error.get("suggestion", "Please switch to a different server or wait for restart.")
-            }
+        if idempotency_key:
+            # Concurrent retries with one key and the same inputs share a single run; a
+            # different upload under the key runs on its own and gets the 422 below
+            flight_key = (idempotency_key, checkpoints.request_fingerprint(resume_content, job_description))
+            result = await run_in_threadpool(checkpoint_flight.do, flight_key, lambda: run_resume_pipeline(
+                resume_content, resume.filename, job_description, model_name, idempotency_key))
         else:
-            return {"success": False, "error": error["message"]}
-
-    # Add small delay to avoid rate limiting
-    print("⏳ Adding 2-second delay to avoid rate limiting...")
-    time.sleep(2)
-
-    # Parse job description
-    print("🔄 Starting job description parsing...")
-    parser_jobdes, jobdes_prompt = helper_function.job_description(job_description)
-    res_jobdes, error = safe_gemini_call_with_auto_restart(model, parser_jobdes, jobdes_prompt)
-    print("job description parsed.")
-    if error:
-        if error.get("auto_restart"):
-            return {
-                "success": False, 
-                "error": error["message"],
-                "error_type": "quota_exceeded",
-                "auto_restarting": True,
-                "restart_reason": error.get("restart_reason", "quota_exceeded"),
-                "server_switch_recommended": error.get("server_switch_recommended", True),
-                "alternative_servers": error.get("alternative_servers", ["gemini-2.5-flash", "gemini-2.0-flash"]),
-                "estimated_restart_time": error.get("estimated_restart_time", "30 seconds"),
-                "suggestion": error.get("suggestion", "Please switch to a different server or wait for restart.")
-            }
-        else:
-            return {"success": False, "error": error["message"]}
+            result = await run_in_threadpool(
+                run_resume_pipeline, resume_content, resume.filename, job_description, model_name
+            )
+    except checkpoints.IdempotencyKeyReused:
+        return JSONResponse(status_code=422, content={
+            "success": False,
+            "error_type": "validation_error",
+            "error": "This idempotency key was already used with a different resume or job description",
+        })
+    finally:
+        admission.controller.release(time.perf_counter() - start_time)
+    metrics.observe("resume_pipeline_duration_seconds", time.perf_counter() - start_time)
+    metrics.inc("resume_requests_total", result="success" if result.get("success") else "error")
+    if result.get("success"):
+        # Render the PDF after the response is sent, so the download click is a cache lookup
+        background_tasks.add_task(prerender.schedule, result["resume_id"])
+    return result
 
-    # Add small delay to avoid rate limiting  
-    print("⏳ Adding 2-second delay before main comparison...")
-    time.sleep(2)
+@app.post("/api/reanalyze")
+async def reanalyze(request: Request):
+    """Re-run the analysis of a stored resume against a new or edited job description"""
+    form = await request.form()
+    resume_id = form.get("resume_id", "")
+    job_description = form.get("jobUrl", "")
+    if not job_description or job_description.strip() == "":
+        job_description = form.get("jobDescription", "")
+    model_name = SERVER_MODELS.get(form.get("selectedServer", "server2"), DEFAULT_MODEL)
+
+    if not resume_id:
+        return {"success": False, "error": "Resume ID is required"}
+    if not helper_function.get_stored_resume_data(resume_id):
+        return {"success": False, "error": "Resume data not found"}
 
-    # Main comparison
-    response = None
     try:
-        if res_resume and res_jobdes:
-            print("🔄 Starting main comparison analysis...")
-            parser_main, main_prompt = helper_function.comparing(res_resume, res_jobdes)
-            response, error = safe_gemini_call_with_auto_restart(model, parser_main, main_prompt, timeout_seconds=100)
-            
-            if error:
-                if error.get("auto_restart"):
-                    return {
-                        "success": False, 
-                        "error": error["message"],
-                        "error_type": "quota_exceeded",
-                        "auto_restarting": True,
-                        "restart_reason": error.get("restart_reason", "quota_exceeded"),
-                        "server_switch_recommended": error.get("server_switch_recommended", True),
-                        "alternative_servers": error.get("alternative_servers", ["gemini-2.5-flash", "gemini-2.0-flash"]),
-                        "estimated_restart_time": error.get("estimated_restart_time", "30 seconds"),
-                        "suggestion": error.get("suggestion", "Please switch to a different server or wait for restart.")
-                    }
-                else:
-                    return {"success": False, "error": error["message"]}
-            
-            if response:
-                # Format Interview Q&A
-                if 'Interview Q&A' in response:
-                    response['Interview Q&A'] = helper_function.format_interview_qa(response['Interview Q&A'])
-                
-                # Clean percentage values
-                if 'Match Percentage' in response:
-                    response['Match Percentage'] = helper_function.clean_percentage(response['Match Percentage'])
+        await admission.controller.acquire()
+    except admission.AdmissionRejected as e:
+        return busy_response(e)
 
-    except Exception as e:
-        traceback.print_exc()
+    start_time = time.perf_counter()
+    try:
+        result = await run_in_threadpool(run_reanalysis, resume_id, job_description, model_name)
+    finally:
+        admission.controller.release(time.perf_counter() - start_time)
+    metrics.inc("resume_requests_total", result="reanalysis" if result.get("success") else "error")
+    return result
 
-    # Add small delay to avoid rate limiting
-    print("⏳ Adding 2-second delay before visualization...")
-    time.sleep(2)
+def error_response(error: Dict) -> Dict[str, Any]:
+    """Response for a failed LLM stage"""
+    if error.get("auto_restart"):
+        return {
+            "success": False, 
+            "error": error["message"],
+            "error_type": "quota_exceeded",
+            "auto_restarting": True,
+            "restart_reason": error.get("restart_reason", "quota_exceeded"),
+            "server_switch_recommended": error.get("server_switch_recommended", True),
+            "alternative_servers": error.get("alternative_servers", ["gemini-2.5-flash", "gemini-2.0-flash"]),
+            "estimated_restart_time": error.get("estimated_restart_time", "30 seconds"),
+            "suggestion": error.get("suggestion", "Please switch to a different server or wait for restart.")
+        }
+    return {"success": False, "error": error["message"]}
 
-    # Visualization
-    visualize_value = None
-    try:
-        print("🔄 Starting visualization data generation...")
-        parser_visual, visual_prompt = helper_function.visualize_data(res_resume, res_jobdes)
-        visualize_value, error = safe_gemini_call_with_auto_restart(model, parser_visual, visual_prompt)
-        
-        if error:
-            if error.get("auto_restart"):
-                return {
-                    "success": False, 
-                    "error": error["message"],
-                    "error_type": "quota_exceeded",
-                    "auto_restarting": True,
-                    "restart_reason": error.get("restart_reason", "quota_exceeded"),
-                    "server_switch_recommended": error.get("server_switch_recommended", True),
-                    "alternative_servers": error.get("alternative_servers", ["gemini-2.5-flash", "gemini-2.0-flash"]),
-                    "estimated_restart_time": error.get("estimated_restart_time", "30 seconds"),
-                    "suggestion": error.get("suggestion", "Please switch to a different server or wait for restart.")
-                }
-            else:
-                visualize_value = None
+class StageRunner:
+    """Runs the LLM stages of one request: model choice, pacing between calls and routing notes"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.routing: Dict[str, Dict] = {}
+        self.llm_calls = 0
+
+    def model_for(self, stage: str, prompt) -> str:
+        """Model name for one stage: the selected one, or a per-stage choice when routing is automatic"""
+        if self.model_name != model_router.AUTO:
+            self.routing[stage] = {"model": self.model_name, "reason": "selected server"}
+            return self.model_name
+        decision = model_router.choose_model(stage, metrics.estimate_tokens(prompt))
+        print(f"🧭 {stage} -> {decision['model']} ({decision['reason']})")
+        self.routing[stage] = decision
+        return decision["model"]
+
+    def call(self, stage: str, parser, prompt, timeout_seconds=60):
+        if self.llm_calls:
+            # Add small delay to avoid rate limiting
+            print(f"⏳ Adding {STAGE_DELAY_SECONDS:g}-second delay before {stage} to avoid rate limiting...")
+            time.sleep(STAGE_DELAY_SECONDS)
+        self.llm_calls += 1
+        return coalesced_gemini_call(self.model_for(stage, prompt), parser, prompt,
+                                     timeout_seconds=timeout_seconds, stage=stage)
+
+    def call_chunked(self, stage: str, chunks, timeout_seconds=60):
+        """Parse chunks of a long input in parallel and merge the partial results locally"""
+        if self.llm_calls:
+            print(f"⏳ Adding {STAGE_DELAY_SECONDS:g}-second delay before {stage} to avoid rate limiting...")
+            time.sleep(STAGE_DELAY_SECONDS)
+        self.llm_calls += len(chunks)
+        model_name = self.model_for(stage, chunks[0][1])
+        print(f"🧩 {stage}: parsing {len(chunks)} chunks, up to {CHUNK_MAX_PARALLEL} at a time")
+        partials = [None] * len(chunks)
+        waiting = list(enumerate(chunks))
+        running = {}
+        while waiting or running:
+            while waiting and len(running) < CHUNK_MAX_PARALLEL:
+                index, (parser, prompt) = waiting.pop(0)
+                future = chunk_executor.submit(coalesced_gemini_call, model_name, parser, prompt, timeout_seconds, stage)
+                running[future] = index
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, error = future.result()
+                if error:
+                    # Chunks not sent yet are dropped; those in flight finish on their own
+                    return None, error
+                partials[running.pop(future)] = result
+        return helper_function.merge_chunk_results(stage, partials), None
+
+    def reuse(self, stage: str, reason: str) -> None:
+        print(f"♻️ Skipping {stage}: {reason}")
+        metrics.inc("stage_reuse_total", stage=stage)
+        self.routing[stage] = {"model": None, "reason": reason}
+
+def run_resume_pipeline(resume_content: bytes, filename: str, job_description: str, model_name: str,
+                        idempotency_key: str = None) -> Dict[str, Any]:
+    """
+    Run PDF extraction and the four LLM stages for one request (on a worker thread).
+    With an idempotency key, completed stages are checkpointed and a retry resumes from them.
+    """
+    runner = StageRunner(model_name)
+    saved = {"stages": {}, "result": None}
+    if idempotency_key:
+        saved = checkpoints.open_checkpoint(
+            idempotency_key, checkpoints.request_fingerprint(resume_content, job_description))
+        if saved["result"]:
+            return saved["result"]
+
+    # Process resume file
+    with metrics.track_stage("pdf_extraction"):
+        resume_text = helper_function.extract_text_from_pdf(io.BytesIO(resume_content))
+    # Split resume into sections once; comparing and visualization only get the sections they need
+    resume_sections = helper_function.segment_resume_sections(resume_text)
+
+    # Parse resume
+    res_resume = saved["stages"].get("parse_resume")
+    if res_resume is not None:
+        runner.reuse("parse_resume", "checkpointed by an earlier attempt")
+    else:
+        resume_chunks = helper_function.resume_chunk_prompts(resume_text, resume_sections)
+        if resume_chunks:
+            res_resume, error = runner.call_chunked("parse_resume", resume_chunks)
         else:
-            if visualize_value and hasattr(visualize_value, 'get'):
-                if 'visual Match Percentage' in visualize_value:
-                    visualize_value['visual Match Percentage'] = helper_function.clean_percentage(visualize_value['visual Match Percentage'])
-    except Exception as e:
-        traceback.print_exc()
+            parser_resume, resume_prompt = helper_function.parse_resume_with_llm(resume_text)
+            res_resume, error = runner.call("parse_resume", parser_resume, resume_prompt)
+        if error:
+            return error_response(error)
+        if idempotency_key and res_resume:
+            checkpoints.save_stage(idempotency_key, "parse_resume", res_resume)
+
+    def save_analysis(partial):
+        checkpoints.save_stage(idempotency_key, "analysis", partial)
+
+    analysis = run_analysis_stages(runner, res_resume, resume_sections, job_description,
+                                   saved["stages"].get("analysis"),
+                                   checkpoint=save_analysis if idempotency_key else None)
+    if not analysis.get("success", True):
+        return analysis
     
     # Store resume data
     resume_id = helper_function.store_resume_data(
         resume_text=resume_text,
         parsed_resume=res_resume,
-        original_filename=resume.filename if resume else ""
+        original_filename=filename,
+        sections=resume_sections
     )
+    helper_function.store_analysis(resume_id, analysis)
+
+    result = {
+        "success": True,
+        "resume_id": resume_id,
+        "resume_data": res_resume,
+        "job_data": analysis["job_data"],
+        "comparison_result": analysis["comparison_result"],
+        "visualization_data": analysis["visualization_data"],
+        "routing": runner.routing
+    }
+    if idempotency_key:
+        checkpoints.save_result(idempotency_key, result)
+    return result
+
+def run_reanalysis(resume_id: str, job_description: str, model_name: str) -> Dict[str, Any]:
+    """Analyze a stored resume against a job description, re-running only stages whose inputs changed"""
+    record = helper_function.get_stored_resume_data(resume_id)
+    previous = record.get("analysis") or {}
+    res_resume = record.get("parsed_data")
+    runner = StageRunner(model_name)
+
+    analysis = run_analysis_stages(runner, res_resume, helper_function.get_resume_sections(resume_id),
+                                   job_description, previous)
+    if not analysis.get("success", True):
+        return analysis
+    helper_function.store_analysis(resume_id, analysis)
 
     return {
         "success": True,
         "resume_id": resume_id,
         "resume_data": res_resume,
+        "job_data": analysis["job_data"],
+        "comparison_result": analysis["comparison_result"],
+        "visualization_data": analysis["visualization_data"],
+        "changed_job_fields": helper_function.changed_job_fields(previous.get("job_data"), analysis["job_data"]),
+        "llm_calls": runner.llm_calls,
+        "routing": runner.routing
+    }
+
+def run_analysis_stages(runner: StageRunner, res_resume: Dict, resume_sections: Dict[str, str],
+                        job_description: str, previous: Dict = None,
+                        checkpoint: Callable[[Dict], None] = None) -> Dict[str, Any]:
+    """
+    Parse the job description, compare and visualize. A stage whose inputs match
+    the previous analysis (or the job description cache) is reused, not re-run.
+    checkpoint, if given, receives the partial analysis after each completed stage.
+    Returns the analysis to store, or an error response with success False.
+    """
+    previous = previous or {}
+    previous_keys = previous.get("stage_keys", {})
+    stage_keys = {}
+
+    # A job description that is only a link is replaced by the fetched posting
+    job_text, job_source = job_fetcher.resolve_job_description(job_description)
+
+    # Parse job description, once per normalized text
+    job_key = helper_function.job_description_key(job_text)
+    if previous.get("job_key") == job_key:
+        res_jobdes = previous.get("job_data")
+    else:
+        res_jobdes = helper_function.get_cached_job_description(job_key)
+    if res_jobdes is not None:
+        runner.reuse("parse_job_description", "job description unchanged")
+    else:
+        print("🔄 Starting job description parsing...")
+        job_chunks = helper_function.job_description_chunk_prompts(job_text, job_source)
+        if job_chunks:
+            res_jobdes, error = runner.call_chunked("parse_job_description", job_chunks)
+        else:
+            parser_jobdes, jobdes_prompt = helper_function.job_description(job_text, job_source)
+            res_jobdes, error = runner.call("parse_job_description", parser_jobdes, jobdes_prompt)
+        print("job description parsed.")
+        if error:
+            return error_response(error)
+        if res_jobdes:
+            helper_function.cache_job_description(job_key, res_jobdes)
+    if checkpoint and res_jobdes is not None:
+        checkpoint({"job_key": job_key, "job_data": res_jobdes, "stage_keys": {}})
+
+    # Main comparison
+    response = None
+    compare_key = helper_function.stage_input_key("comparing", res_resume, res_jobdes)
+    if previous_keys.get("comparing") == compare_key:
+        response = previous.get("comparison_result")
+        runner.reuse("comparing", "inputs unchanged")
+    else:
+        try:
+            if res_resume and res_jobdes:
+                print("🔄 Starting main comparison analysis...")
+                parser_main, main_prompt = helper_function.comparing(res_resume, res_jobdes)
+                response, error = runner.call("comparing", parser_main, main_prompt, timeout_seconds=100)
+                
+                if error:
+                    return error_response(error)
+                
+                if response:
+                    # Format Interview Q&A
+                    if 'Interview Q&A' in response:
+                        response['Interview Q&A'] = helper_function.format_interview_qa(response['Interview Q&A'])
+                    
+                    # Clean percentage values
+                    if 'Match Percentage' in response:
+                        response['Match Percentage'] = helper_function.clean_percentage(response['Match Percentage'])
+
+        except Exception as e:
+            traceback.print_exc()
+    if response:
+        stage_keys["comparing"] = compare_key
+        if checkpoint:
+            checkpoint({"job_key": job_key, "job_data": res_jobdes, "comparison_result": response,
+                        "stage_keys": dict(stage_keys)})
+
+    # Visualization: derived locally from the results above; the LLM only fills what cannot be derived
+    visualize_value, missing_fields = helper_function.build_visualization_data(
+        res_resume, res_jobdes, response, resume_sections)
+    visual_key = helper_function.stage_input_key("visualize_data", res_resume, res_jobdes, resume_sections)
+    previous_visual = previous.get("visualization_data") or {}
+    if not missing_fields:
+        runner.reuse("visualize_data", "derived locally")
+    elif previous_keys.get("visualize_data") == visual_key and all(field in previous_visual for field in missing_fields):
+        visualize_value.update({field: previous_visual[field] for field in missing_fields})
+        runner.reuse("visualize_data", "inputs unchanged")
+        stage_keys["visualize_data"] = visual_key
+    else:
+        try:
+            print(f"🔄 Starting visualization data generation for {len(missing_fields)} field(s)...")
+            parser_visual, visual_prompt = helper_function.visualize_data(
+                res_resume, res_jobdes, resume_sections, fields=missing_fields)
+            llm_visual, error = runner.call("visualize_data", parser_visual, visual_prompt)
+            
+            if error:
+                if error.get("auto_restart"):
+                    return error_response(error)
+            elif llm_visual and hasattr(llm_visual, 'get'):
+                if 'visual Match Percentage' in llm_visual:
+                    llm_visual['visual Match Percentage'] = helper_function.clean_percentage(llm_visual['visual Match Percentage'])
+                visualize_value.update({field: llm_visual[field] for field in missing_fields if field in llm_visual})
+                stage_keys["visualize_data"] = visual_key
+        except Exception as e:
+            traceback.print_exc()
+    visualize_value = visualize_value or None
+
+    return {
+        "job_key": job_key,
+        "job_description": job_description,
         "job_data": res_jobdes,
         "comparison_result": response,
-        "visualization_data": visualize_value
+        "visualization_data": visualize_value,
+        "stage_keys": stage_keys
     }
 
 @app.post("/api/generate-resume")
@@ -359,14 +808,20 @@ async def generate_resume(
     if not stored_data:
         return {"success": False, "error": "Resume data not found"}
 
-    final_resume_data = stored_data.get("parsed_data", {})
+    final_resume_data = stored_data.get("parsed_data") or {}
     feedback_data = {"feedback": feedback}
     
     try:
         output_resume = f"Enhanced Resume for {final_resume_data.get('Name', 'Candidate')}"
-        resume_name = final_resume_data.get('Name', 'resume')
+        file_name = prerender.pdf_file_name(final_resume_data)
         
-        pdf_success, pdf_data = helper_function.create_resume_pdf(output_resume, file_name=f"{resume_name}.pdf")
+        # Usually pre-rendered in the background after analysis; render now otherwise
+        rendered = await run_in_threadpool(prerender.get, resume_id)
+        if rendered is None:
+            rendered = await run_in_threadpool(prerender.render, final_resume_data)
+            if rendered[0]:
+                prerender.put(resume_id, rendered)
+        pdf_success, pdf_data = rendered
         
         if pdf_success:
             return {
@@ -374,7 +829,9 @@ async def generate_resume(
                 "message": "Resume generated successfully!",
                 "resume_content": output_resume,
                 "pdf_generated": True,
-                "file_name": f"{resume_name}.pdf"
+                "pdf_base64": pdf_data,
+                "file_name": file_name,
+                "filename": file_name
             }
         else:
             return {
@@ -389,5 +846,5 @@ async def generate_resume(
 # Application Entry Point
 # -----------------------------------
 if __name__ == "__main__":
-    import re
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8503)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Admission control for /api/process-resume.
+At most MAX_IN_FLIGHT analyses run at once and at most MAX_QUEUED wait for a
+slot; anything beyond that is rejected immediately so the server can answer
+429 instead of letting every request slow down together.
+The controller lives on the event loop, so it needs no locks.
+"""
+import os
+import math
+import asyncio
+import statistics
+from collections import deque
+
+import metrics
+
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT_ANALYSES", "4"))
+MAX_QUEUED = int(os.getenv("MAX_QUEUED_ANALYSES", "8"))
+# Longest a request may wait for a slot before it is rejected
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_QUEUE_TIMEOUT_SECONDS", "60"))
+
+# Assumed time an analysis holds its slot before any have been observed
+DEFAULT_HOLD_SECONDS = float(os.getenv("ANALYSIS_DEFAULT_SECONDS", "15"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue is full or the wait timed out"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queued: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters = deque()
+        # How long recent analyses held their slot, whatever stages and models they ran
+        self.recent_hold_seconds = deque(maxlen=metrics.RECENT_SAMPLES)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.waiters)
+
+    def _publish(self) -> None:
+        metrics.set_gauge("admission_in_flight", self.in_flight)
+        metrics.set_gauge("admission_queue_depth", len(self.waiters))
+
+    def estimate_wait_seconds(self) -> int:
+        """Seconds until a new request would likely get a slot, from recent slot hold times"""
+        per_request = statistics.median(self.recent_hold_seconds) if self.recent_hold_seconds else DEFAULT_HOLD_SECONDS
+        rounds = (len(self.waiters) + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(per_request * rounds))
+
+    async def acquire(self) -> None:
+        """Wait for an analysis slot or raise AdmissionRejected"""
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            self._publish()
+            return
+
+        if len(self.waiters) >= self.max_queued:
+            metrics.inc("admission_rejected_total", reason="queue_full")
+            raise AdmissionRejected("queue_full", self.estimate_wait_seconds())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._publish()
+        try:
+            # release() hands its slot straight to the waiter, so in_flight is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+                self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.inc("admission_rejected_total", reason="queue_timeout")
+                raise AdmissionRejected("queue_timeout", self.estimate_wait_seconds())
+            raise
+
+    def release(self, held_seconds: float = None) -> None:
+        """Free a slot, handing it to the oldest waiter if there is one"""
+        if held_seconds is not None:
+            self.recent_hold_seconds.append(held_seconds)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def status(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self.waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+        }
+
+
+controller = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUED, QUEUE_TIMEOUT_SECONDS)
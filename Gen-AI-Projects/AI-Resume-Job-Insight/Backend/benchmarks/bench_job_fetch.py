@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark job_fetcher against the local job-board stand-in.
+Runs rounds of concurrent fetches over a few postings and reports latency
+and how many requests the board answered with 200 and 304.
+
+Usage: python benchmarks/bench_job_fetch.py [--clients 8] [--rounds 3] [--postings 4]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Revalidate on every round instead of serving from the freshness window
+os.environ.setdefault("JOB_PAGE_FRESH_SECONDS", "0")
+# The stand-in board listens on 127.0.0.1, which real fetches refuse
+os.environ.setdefault("JOB_FETCH_ALLOW_PRIVATE_HOSTS", "1")
+
+import job_fetcher  # noqa: E402
+from benchmarks.fake_job_board import JobBoardHandler, start_job_board  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--clients", type=int, default=8)
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--postings", type=int, default=4)
+    arg_parser.add_argument("--delay", type=float, default=0.05, help="board response delay in seconds")
+    args = arg_parser.parse_args()
+
+    base_url, server = start_job_board(args.delay)
+    urls = [f"{base_url}/jobs/{n}" for n in range(args.postings)]
+
+    def timed_fetch(url):
+        start = time.perf_counter()
+        text, source = job_fetcher.resolve_job_description(url)
+        assert source == url and "Responsibilities" in text and "Sign in" not in text, text
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        for round_number in range(1, args.rounds + 1):
+            before = dict(JobBoardHandler.stats)
+            work = [urls[i % len(urls)] for i in range(args.clients * 2)]
+            latencies = list(pool.map(timed_fetch, work))
+            served = {status: JobBoardHandler.stats[status] - before[status] for status in before}
+            print(f"round {round_number}: {len(work)} fetches, median {statistics.median(latencies) * 1000:.1f} ms, "
+                  f"max {max(latencies) * 1000:.1f} ms, board served {served}")
+
+    print("\nExtracted text of one posting:\n" + job_fetcher.resolve_job_description(urls[0])[0])
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
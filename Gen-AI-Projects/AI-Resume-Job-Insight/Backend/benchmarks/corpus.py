@@ -0,0 +1,101 @@
+"""
+Synthetic benchmark corpus: resume PDFs rendered with fpdf and matching job
+descriptions. Generation is seeded, so two runs with the same arguments send
+byte-identical inputs.
+"""
+import os
+import random
+from typing import List, Tuple
+
+from fpdf import FPDF
+
+FIRST_NAMES = ["Jordan", "Avery", "Riley", "Morgan", "Casey", "Taylor", "Quinn", "Harper", "Rowan", "Sage"]
+LAST_NAMES = ["Khan", "Smith", "Garcia", "Chen", "Okafor", "Novak", "Silva", "Ahmed", "Larsen", "Ito"]
+TITLES = ["Data Engineer", "Backend Developer", "Data Analyst", "ML Engineer", "UI/UX Designer"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Analytics", "Wayne Data"]
+SKILLS = ["Python", "SQL", "Spark", "Airflow", "Kubernetes", "Docker", "AWS", "GCP", "Kafka", "React",
+          "TypeScript", "FastAPI", "Django", "Pandas", "TensorFlow", "PyTorch", "Terraform", "Go", "Snowflake"]
+BULLETS = [
+    "Built and operated batch and streaming pipelines processing {n} million events per day.",
+    "Reduced infrastructure cost by {n} percent by right-sizing clusters and caching hot queries.",
+    "Led a team of {n} engineers delivering a customer-facing analytics product.",
+    "Designed REST APIs with FastAPI serving {n} thousand requests per minute.",
+    "Migrated {n} legacy cron jobs to Airflow with alerting and retries.",
+]
+
+
+def build_resume_pdf(rng: random.Random, pages: int = 1) -> Tuple[str, bytes]:
+    """Render one synthetic resume and return (candidate name, PDF bytes)"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    skills = rng.sample(SKILLS, 8)
+
+    pdf = FPDF()
+    pdf.set_margins(20, 20, 20)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, name, ln=True)
+    pdf.set_font("Arial", "", 10)
+    handle = name.lower().replace(" ", ".")
+    pdf.cell(0, 5, f"{handle}@example.com | +1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)} | "
+                   f"linkedin.com/in/{handle.replace('.', '-')}", ln=True)
+
+    def heading(text):
+        pdf.ln(3)
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 7, text, ln=True)
+        pdf.set_font("Arial", "", 10)
+
+    heading("Summary")
+    pdf.multi_cell(0, 5, f"{rng.choice(TITLES)} with {rng.randint(1, 12)} years of experience in {', '.join(skills[:3])}.")
+    heading("Skills")
+    pdf.multi_cell(0, 5, ", ".join(skills))
+    heading("Experience")
+    year = 2024
+    while pdf.page_no() < pages or year == 2024:
+        start = year - rng.randint(1, 4)
+        pdf.set_font("Arial", "B", 10)
+        pdf.cell(0, 5, f"{rng.choice(TITLES)} - {rng.choice(COMPANIES)}  {start} - {year}", ln=True)
+        pdf.set_font("Arial", "", 10)
+        for bullet in rng.sample(BULLETS, 3):
+            pdf.multi_cell(0, 5, "- " + bullet.format(n=rng.randint(2, 90)))
+        year = start
+    heading("Education")
+    pdf.multi_cell(0, 5, f"BSc Computer Science, {year - 4}")
+    heading("Certificates")
+    pdf.multi_cell(0, 5, "Google Cloud Professional Data Engineer")
+
+    return name, pdf.output(dest="S").encode("latin-1")
+
+
+def build_job_description(rng: random.Random) -> str:
+    """Compose one synthetic job description"""
+    skills = rng.sample(SKILLS, 6)
+    return (
+        f"{rng.choice(TITLES)} - {rng.choice(COMPANIES)} (Full-time)\n\n"
+        f"We are looking for an engineer with {rng.randint(2, 6)}+ years of experience.\n"
+        "Responsibilities:\n"
+        "- Design, build and maintain data products\n"
+        "- Collaborate with product and analytics teams\n"
+        f"Required skills: {', '.join(skills)}\n"
+        "Qualifications: BSc in Computer Science or equivalent experience\n"
+    )
+
+
+def build_corpus(size: int = 20, pages: int = 1, seed: int = 7) -> List[Tuple[str, bytes, str]]:
+    """Return [(file name, resume PDF bytes, job description)]"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(size):
+        name, pdf_bytes = build_resume_pdf(rng, pages)
+        corpus.append((f"{index:03d}_{name.replace(' ', '_')}.pdf", pdf_bytes, build_job_description(rng)))
+    return corpus
+
+
+def write_corpus(directory: str, size: int = 20, pages: int = 1, seed: int = 7) -> None:
+    """Write the corpus to disk as <name>.pdf / <name>.txt pairs for manual runs"""
+    os.makedirs(directory, exist_ok=True)
+    for file_name, pdf_bytes, job_description in build_corpus(size, pages, seed):
+        with open(os.path.join(directory, file_name), "wb") as f:
+            f.write(pdf_bytes)
+        with open(os.path.join(directory, file_name[:-4] + ".txt"), "w") as f:
+            f.write(job_description)
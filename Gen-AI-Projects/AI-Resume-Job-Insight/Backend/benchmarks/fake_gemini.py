@@ -0,0 +1,188 @@
+"""
+Local stand-in for langchain_google_genai.GoogleGenerativeAI.
+Returns schema-valid JSON for each of the four stage parsers after a simulated
+latency, and can inject quota and invalid-JSON errors. Plug it into the server
+with LLM_CLIENT_FACTORY=benchmarks.fake_gemini:FakeGemini.
+
+Behaviour is configured with FakeGemini.configure(...) in-process, or with the
+FAKE_GEMINI_CONFIG environment variable (a JSON object with the same keys) when
+the server runs in another process.
+"""
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import defaultdict, deque
+
+from google.api_core.exceptions import ResourceExhausted
+
+DEFAULT_CONFIG = {
+    # Latency distribution: "fixed", "uniform" or "lognormal"
+    "latency": "lognormal",
+    # Median seconds per call, per model (falls back to "default")
+    "median_seconds": {"default": 1.0, "gemini-2.5-pro": 2.5, "gemini-2.5-flash": 1.0, "gemini-2.0-flash": 0.8},
+    # Spread: sigma for lognormal, +/- fraction for uniform
+    "spread": 0.5,
+    # Extra seconds per 1000 prompt tokens (chars / 4), so long prompts are slower
+    "seconds_per_1k_tokens": 0.0,
+    # Upper bound on a single simulated call
+    "max_seconds": 30.0,
+    # Probability of raising a quota error / returning a non-JSON body
+    "quota_error_rate": 0.0,
+    "invalid_json_rate": 0.0,
+    # Per-API-key rate limit: calls beyond this many per window get a quota error
+    "requests_per_key": None,
+    "rate_window_seconds": 60.0,
+    "seed": None,
+}
+
+# Raised as the ResourceExhausted (HTTP 429) the real client raises; str() adds the "429 "
+QUOTA_ERROR_MESSAGE = (
+    "Resource has been exhausted (e.g. check quota). Quota exceeded for metric: "
+    "generativelanguage.googleapis.com/generate_content_free_tier_requests"
+)
+
+SKILL_VOCABULARY = {
+    "Python", "SQL", "Spark", "Airflow", "Kubernetes", "Docker", "AWS", "GCP", "Azure", "Kafka",
+    "React", "TypeScript", "FastAPI", "Django", "Pandas", "TensorFlow", "PyTorch", "Terraform",
+    "Go", "Java", "Scala", "Snowflake", "dbt", "Tableau", "Redis", "PostgreSQL",
+}
+
+FIELD_PATTERN = re.compile(r'"([^"\n]+)": (?:string|List|Object|Integer|Number)')
+
+
+def stage_response(prompt_text: str) -> dict:
+    """Build a schema-valid response for whichever stage schema appears in the prompt"""
+    fields = FIELD_PATTERN.findall(prompt_text)
+    words = re.findall(r"[A-Za-z][A-Za-z+#.]{2,}", prompt_text)
+    skills = sorted({word for word in words if word in SKILL_VOCABULARY})[:12] or ["Python", "SQL"]
+
+    if any(field.startswith("visual ") for field in fields):
+        # The visualization prompt may ask for only the fields that could not be derived locally
+        visual = {
+            "visual Match Percentage": 72,
+            "visual Missing / Weak Skills": skills[-2:],
+            "visual Confidence scores": {"skills": 0.8, "experience": 0.7, "education": 0.9},
+            "visual Resume Skills": skills,
+            "visual Job Skills": skills[:6],
+            "visual Candidate Experience (years)": 4,
+            "visual Required Experience (years)": 3,
+            "visual Resume Sections": {"Experience": 40, "Skills": 25, "Education": 15, "Projects": 20},
+        }
+        return {field: value for field, value in visual.items() if field in fields}
+    if "Match Percentage" in fields:
+        return {
+            "Match Percentage": "72",
+            "Missing Skills": skills[-2:],
+            "Matching Skills": skills[:-2],
+            "Suggested Improvements": "Quantify impact in the experience section.",
+            "Interview Q&A": "**Q: Describe a pipeline you built.**\n\n**A: A streaming ETL in Python.**",
+            "ATS-optimized keyword list": ", ".join(skills),
+            "Suggested rewrites": "- Led migration of batch jobs to streaming, cutting latency by 40%.",
+            "Confidence scores": {"overall": 0.75},
+        }
+    if "Job Title" in fields:
+        return {
+            "Job Title": "Data Engineer",
+            "Employment Type": "Full-time",
+            "Responsibilities": ["Build data pipelines", "Maintain data quality"],
+            "Required Skills": skills[:6],
+            "Qualifications": ["BSc Computer Science"],
+            "Experience Level": "Mid-level",
+            "Year of Experience": "3+ years",
+        }
+    resume = {
+        "Name": "Jordan Avery",
+        "Email": "jordan.avery@example.com",
+        "Phone": "+15552013344",
+        "LinkedIn": "https://linkedin.com/in/jordan-avery",
+        "Address": "Remote",
+        "Experience Level": "Mid-level",
+        "Education": "BSc Computer Science, 2018",
+        "Skills": skills,
+        "Achievements": ["Reduced batch latency by 40%"],
+        "Work Experience": "4 years as Data Engineer",
+        "Projects": ["Resume Matcher"],
+        "Certificates": ["Google Cloud Professional Data Engineer"],
+    }
+    # Chunked parsing asks each chunk for a subset of the resume fields
+    return {field: value for field, value in resume.items() if field in fields} if fields else resume
+
+
+class FakeGemini:
+    """Drop-in for GoogleGenerativeAI(model=..., temperature=...) exposing invoke()"""
+
+    config = dict(DEFAULT_CONFIG, **json.loads(os.getenv("FAKE_GEMINI_CONFIG", "{}")))
+    calls = 0
+    _lock = threading.Lock()
+    _key_calls = defaultdict(deque)
+    _random = random.Random(config["seed"])
+
+    def __init__(self, model: str = "gemini-2.5-flash", temperature: float = 0.1, **kwargs):
+        self.model = model
+        self.temperature = temperature
+        self.api_key = kwargs.get("google_api_key")
+
+    @classmethod
+    def configure(cls, **overrides):
+        """Replace the shared configuration (unspecified keys fall back to defaults)"""
+        cls.config = dict(DEFAULT_CONFIG, **overrides)
+        cls._random = random.Random(cls.config["seed"])
+        cls._key_calls.clear()
+        cls.calls = 0
+
+    def _latency(self):
+        """Return (simulated seconds, error roll) for one call"""
+        config = self.config
+        medians = config["median_seconds"]
+        median = medians.get(self.model, medians.get("default", 1.0)) if isinstance(medians, dict) else medians
+        with self._lock:
+            if config["latency"] == "fixed":
+                seconds = median
+            elif config["latency"] == "uniform":
+                seconds = self._random.uniform(median * (1 - config["spread"]), median * (1 + config["spread"]))
+            else:
+                seconds = self._random.lognormvariate(0, config["spread"]) * median
+            roll = self._random.random()
+        return min(seconds, config["max_seconds"]), roll
+
+    def _over_key_limit(self) -> bool:
+        """Count a call against this client's API key; True once the key is over its limit"""
+        limit = self.config["requests_per_key"]
+        if not limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            window = self._key_calls[self.api_key]
+            while window and window[0] < now - self.config["rate_window_seconds"]:
+                window.popleft()
+            if len(window) >= limit:
+                return True
+            window.append(now)
+            return False
+
+    def invoke(self, prompt, **kwargs) -> str:
+        with self._lock:
+            FakeGemini.calls += 1
+        if self._over_key_limit():
+            # Rejected up front, like a 429 from the API
+            raise ResourceExhausted(QUOTA_ERROR_MESSAGE)
+        if isinstance(prompt, (list, tuple)):
+            prompt_text = "\n".join(str(getattr(message, "content", message)) for message in prompt)
+        elif hasattr(prompt, "to_string"):
+            prompt_text = prompt.to_string()
+        else:
+            prompt_text = str(prompt)
+
+        seconds, roll = self._latency()
+        seconds += len(prompt_text) / 4000 * self.config.get("seconds_per_1k_tokens", 0.0)
+        time.sleep(min(seconds, self.config["max_seconds"]))
+
+        if roll < self.config["quota_error_rate"]:
+            raise ResourceExhausted(QUOTA_ERROR_MESSAGE)
+        if roll < self.config["quota_error_rate"] + self.config["invalid_json_rate"]:
+            return ""
+
+        return "```json\n" + json.dumps(stage_response(prompt_text), indent=2) + "\n```"
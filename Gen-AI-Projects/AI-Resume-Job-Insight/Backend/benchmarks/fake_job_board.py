@@ -0,0 +1,91 @@
+"""
+Local HTTP stand-in for a job board, for exercising job_fetcher without the
+network. Serves job postings wrapped in navigation, scripts and footers,
+answers conditional GETs with 304 and counts what it served.
+
+    /jobs/<n>           HTML posting with ETag and Last-Modified
+    /jobs/<n>?plain=1   HTML posting without validators
+"""
+import time
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+POSTING_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Senior Data Engineer {n} | Example Jobs</title>
+<style>body {{ font-family: sans-serif; }}</style>
+<script>window.analytics = {{ track: function () {{}} }};</script></head>
+<body>
+<header><nav><a href="/">Home</a> <a href="/jobs">All jobs</a> <a href="/login">Sign in</a></nav></header>
+<aside class="related">Similar jobs: Data Analyst, ML Engineer</aside>
+<main>
+  <h1>Senior Data Engineer {n}</h1>
+  <div class="job-description">
+    <p>Employment type: Full-time. Location: Remote.</p>
+    <h2>Responsibilities</h2>
+    <ul><li>Build and operate batch and streaming pipelines in Spark and Airflow</li>
+        <li>Own data models in Snowflake and dbt</li>
+        <li>Work with analysts to ship reliable dashboards</li></ul>
+    <h2>Requirements</h2>
+    <ul><li>5+ years of experience in data engineering</li>
+        <li>Strong Python and SQL</li>
+        <li>Experience with AWS or GCP, Docker and Kubernetes</li></ul>
+  </div>
+</main>
+<form action="/apply"><button>Apply now</button></form>
+<footer>&copy; Example Jobs. Privacy. Terms.</footer>
+</body></html>
+"""
+
+LAST_MODIFIED = formatdate(time.time() - 3600, usegmt=True)
+
+
+class JobBoardHandler(BaseHTTPRequestHandler):
+    stats = {"200": 0, "304": 0}
+    stats_lock = threading.Lock()
+    delay_seconds = 0.0
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if not parts.path.startswith("/jobs/"):
+            self.send_error(404)
+            return
+        time.sleep(self.delay_seconds)
+        posting = parts.path.rsplit("/", 1)[-1]
+        plain = "plain" in parse_qs(parts.query)
+        etag = f'"posting-{posting}-v1"'
+
+        if not plain and (self.headers.get("If-None-Match") == etag
+                          or self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+            self._count("304")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = POSTING_TEMPLATE.format(n=posting).encode("utf-8")
+        self._count("200")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if not plain:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, status):
+        with self.stats_lock:
+            self.stats[status] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_job_board(delay_seconds: float = 0.0):
+    """Serve the stand-in on a free local port; returns (base_url, server)"""
+    JobBoardHandler.delay_seconds = delay_seconds
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JobBoardHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", server
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Measure cold import cost of the backend and its heavy dependencies.
+Each module is imported in a fresh interpreter with -X importtime so shared
+dependencies are not hidden by an earlier import.
+
+Usage: python benchmarks/import_cost.py [--repeat 3] [module ...]
+"""
+import os
+import sys
+import argparse
+import subprocess
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "fastapi",
+    "uvicorn",
+    "langchain_google_genai",
+    "langchain.output_parsers",
+    "langchain.prompts",
+    "langchain_core.prompts",
+    "fpdf",
+    "PyPDF2",
+    "helper_function",
+    "Server",
+]
+
+
+def import_seconds(module: str) -> float:
+    """Cumulative import time of a module in a fresh interpreter"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            total_us = int(parts[1])
+    return total_us / 1_000_000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    args = arg_parser.parse_args()
+
+    print(f"{'module':<28} {'median':>9} {'min':>9}")
+    for module in args.modules:
+        samples = [import_seconds(module) for _ in range(args.repeat)]
+        print(f"{module:<28} {statistics.median(samples):8.3f}s {min(samples):8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
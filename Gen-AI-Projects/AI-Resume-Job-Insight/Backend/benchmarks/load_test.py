@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Load test for /api/process-resume without spending Gemini quota.
+
+By default the FastAPI app is started in-process on a free port with the
+FakeGemini stand-in; --target-url points the clients at a server that is
+already running (start it with LLM_CLIENT_FACTORY=benchmarks.fake_gemini:FakeGemini).
+Results are written as JSON so runs can be compared with --compare.
+
+Usage:
+    python benchmarks/load_test.py --clients 8 --requests 40
+    python benchmarks/load_test.py --quota-error-rate 0.05 --compare benchmarks/results/previous.json
+    python benchmarks/load_test.py --supervisor --restart-interval 5 --requests 60
+    python benchmarks/load_test.py --api-keys 3 --requests-per-key 6 --rate-window 10
+    python benchmarks/load_test.py --target-url http://127.0.0.1:8503 --server-pid 12345
+
+Peak RSS is that of this process for the in-process server, and the summed
+VmHWM of the server process and its workers (sampled from /proc) for
+--supervisor or --target-url with --server-pid. It is left out when it cannot
+be measured.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import resource
+import platform
+import statistics
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.fake_gemini import FakeGemini  # noqa: E402
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+# -----------------------------------
+# In-process server
+# -----------------------------------
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(stage_delay: float):
+    """Start Server.app with FakeGemini on a free port; returns (base_url, uvicorn server)"""
+    os.environ["LLM_CLIENT_FACTORY"] = "benchmarks.fake_gemini:FakeGemini"
+    os.environ["STAGE_DELAY_SECONDS"] = str(stage_delay)
+    os.chdir(BACKEND_DIR)
+
+    import uvicorn
+    import Server
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(Server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/", server
+
+
+def start_supervised_server(stage_delay: float, fake_config: dict):
+    """Start run_server.py (supervisor + workers) with FakeGemini; returns (base_url, supervisor process)"""
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port), HOST="127.0.0.1",
+               LLM_CLIENT_FACTORY="benchmarks.fake_gemini:FakeGemini",
+               FAKE_GEMINI_CONFIG=json.dumps(fake_config),
+               STAGE_DELAY_SECONDS=str(stage_delay))
+    process = subprocess.Popen([sys.executable, "run_server.py"], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}/"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}api/ready", timeout=2).status_code == 200:
+                return base_url, process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("supervised server did not become ready")
+
+
+def restart_periodically(process, interval: float, stop: threading.Event, restarts: list):
+    """Send SIGHUP (graceful restart) to the supervisor every interval seconds"""
+    while not stop.wait(interval):
+        process.send_signal(signal.SIGHUP)
+        restarts.append(time.perf_counter())
+
+
+# -----------------------------------
+# Clients
+# -----------------------------------
+def percentile(samples, quantile):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(quantile * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def process_tree(pid: int) -> list:
+    """pid and all its descendants, from the parent pids in /proc/<pid>/stat"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid is the second field after the ")" closing the command name
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, ()))
+    return tree
+
+
+def vm_hwm_kb(pid: int) -> int:
+    """Peak resident set size (VmHWM) of a live process in kB, 0 if it is gone"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def sample_server_rss(pid: int, stop: threading.Event, peak: dict, interval: float = 0.5):
+    """Track the largest summed VmHWM of a server process and its workers until stop is set"""
+    while True:
+        total = sum(vm_hwm_kb(member) for member in process_tree(pid))
+        peak["kb"] = max(peak["kb"], total)
+        if stop.wait(interval):
+            return
+
+
+def send_request(session, base_url, selected_server, sample, timeout):
+    file_name, pdf_bytes, job_description = sample
+    start = time.perf_counter()
+    try:
+        response = session.post(
+            f"{base_url}api/process-resume",
+            data={"jobDescription": job_description, "selectedServer": selected_server},
+            files={"resume": (file_name, pdf_bytes, "application/pdf")},
+            timeout=timeout,
+        )
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            return elapsed, f"http_{response.status_code}"
+        body = response.json()
+        if body.get("success"):
+            return elapsed, "success"
+        return elapsed, body.get("error_type") or "error"
+    except requests.RequestException as e:
+        return time.perf_counter() - start, type(e).__name__
+
+
+def run_load(base_url, corpus, clients, total_requests, selected_server, timeout):
+    latencies, outcomes = [], {}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def client():
+        with requests.Session() as session:
+            for index in counter:
+                elapsed, outcome = send_request(session, base_url, selected_server, corpus[index % len(corpus)], timeout)
+                with lock:
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                    if outcome == "success":
+                        latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+    duration = time.perf_counter() - start
+    return latencies, outcomes, duration
+
+
+# -----------------------------------
+# Reporting
+# -----------------------------------
+def summarize(args, latencies, outcomes, duration, local, server_peak_kb=None):
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "clients": args.clients,
+            "requests": args.requests,
+            "selected_server": args.selected_server,
+            "pages": args.pages,
+            "stage_delay": args.stage_delay,
+            "target_url": args.target_url or "in-process",
+            "fake_gemini": FakeGemini.config if local else None,
+            "supervisor": args.supervisor,
+            "restart_interval": args.restart_interval,
+            "api_keys": args.api_keys,
+        },
+        "duration_seconds": round(duration, 3),
+        "requests_per_second": round(sum(outcomes.values()) / duration, 3) if duration else None,
+        "outcomes": outcomes,
+        "latency_seconds": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": statistics.mean(latencies) if latencies else None,
+            "max": max(latencies) if latencies else None,
+        },
+        # In-process: this process holds both the server and the clients.
+        # Otherwise only what was sampled from /proc, if anything.
+        "peak_rss_mb": (peak_rss_mb() if local and not args.supervisor
+                        else round(server_peak_kb / 1024, 1) if server_peak_kb else None),
+        "llm_calls": FakeGemini.calls if local and not args.supervisor else None,
+        "restarts": getattr(args, "restarts_sent", 0),
+    }
+
+
+def print_report(result, previous=None):
+    latency = result["latency_seconds"]
+    print("=" * 60)
+    print(f"📊 {result['config']['requests']} requests, {result['config']['clients']} clients "
+          f"in {result['duration_seconds']}s ({result['requests_per_second']} req/s)")
+    print(f"   outcomes: {result['outcomes']}")
+    for key in ("p50", "p95", "p99"):
+        value = latency[key]
+        line = f"   {key}: {value:.3f}s" if value is not None else f"   {key}: n/a"
+        if previous and previous["latency_seconds"].get(key) and value is not None:
+            line += f"  (was {previous['latency_seconds'][key]:.3f}s, {value / previous['latency_seconds'][key] - 1:+.1%})"
+        print(line)
+    if result["peak_rss_mb"] is not None:
+        print(f"   peak RSS: {result['peak_rss_mb']} MB")
+    else:
+        print("   peak RSS: n/a (pass --server-pid for a server on this host)")
+    if result["llm_calls"] is not None:
+        print(f"   LLM calls: {result['llm_calls']}")
+    if result["restarts"]:
+        print(f"   graceful restarts during run: {result['restarts']}")
+    print("=" * 60)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    arg_parser.add_argument("--requests", type=int, default=20, help="total requests")
+    arg_parser.add_argument("--selected-server", default="server2", help="selectedServer form value")
+    arg_parser.add_argument("--corpus-size", type=int, default=20)
+    arg_parser.add_argument("--pages", type=int, default=1, help="pages per synthetic resume")
+    arg_parser.add_argument("--seed", type=int, default=7)
+    arg_parser.add_argument("--timeout", type=float, default=180)
+    arg_parser.add_argument("--target-url", help="benchmark a running server instead of an in-process one")
+    arg_parser.add_argument("--server-pid", type=int,
+                            help="with --target-url: pid of the server (on this host) to sample peak RSS from")
+    arg_parser.add_argument("--stage-delay", type=float, default=0.0, help="STAGE_DELAY_SECONDS for the in-process server")
+    arg_parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    arg_parser.add_argument("--median", type=float, help="median fake call latency in seconds for every model")
+    arg_parser.add_argument("--spread", type=float, default=0.5)
+    arg_parser.add_argument("--seconds-per-1k-tokens", type=float, default=0.0,
+                            help="extra fake latency per 1000 prompt tokens")
+    arg_parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--invalid-json-rate", type=float, default=0.0)
+    arg_parser.add_argument("--api-keys", type=int, default=0,
+                            help="pool this many fake API keys (GOOGLE_API_KEYS) in the server")
+    arg_parser.add_argument("--requests-per-key", type=int,
+                            help="fake per-key rate limit: calls per --rate-window before quota errors")
+    arg_parser.add_argument("--rate-window", type=float, default=10.0, help="seconds of the fake per-key rate limit")
+    arg_parser.add_argument("--supervisor", action="store_true",
+                            help="run the fake-model server under run_server.py instead of in-process")
+    arg_parser.add_argument("--restart-interval", type=float, default=0.0,
+                            help="with --supervisor: send SIGHUP (graceful restart) every N seconds")
+    arg_parser.add_argument("--output", help="result JSON path (default: benchmarks/results/<timestamp>.json)")
+    arg_parser.add_argument("--compare", help="previous result JSON to compare against")
+    args = arg_parser.parse_args()
+
+    local = not args.target_url
+    server = supervisor = None
+    if local:
+        fake_config = {
+            "latency": args.latency,
+            "spread": args.spread,
+            "seconds_per_1k_tokens": args.seconds_per_1k_tokens,
+            "quota_error_rate": args.quota_error_rate,
+            "invalid_json_rate": args.invalid_json_rate,
+            "seed": args.seed,
+            "requests_per_key": args.requests_per_key,
+            "rate_window_seconds": args.rate_window,
+        }
+        if args.median is not None:
+            fake_config["median_seconds"] = args.median
+        if args.api_keys:
+            os.environ["GOOGLE_API_KEYS"] = ",".join(f"fake-key-{n}" for n in range(1, args.api_keys + 1))
+            # A quota-limited key comes back when the fake rate window has passed
+            os.environ["API_KEY_QUARANTINE_SECONDS"] = str(args.rate_window)
+        FakeGemini.configure(**fake_config)
+        if args.supervisor:
+            base_url, supervisor = start_supervised_server(args.stage_delay, fake_config)
+        else:
+            base_url, server = start_local_server(args.stage_delay)
+    else:
+        base_url = args.target_url.rstrip("/") + "/"
+
+    print(f"🧪 Building corpus ({args.corpus_size} resumes, {args.pages} page(s) each)...")
+    corpus = build_corpus(args.corpus_size, args.pages, args.seed)
+
+    print(f"🚀 Running {args.requests} requests with {args.clients} clients against {base_url}")
+    stop_restarts, restarts = threading.Event(), []
+    if supervisor and args.restart_interval:
+        threading.Thread(target=restart_periodically, daemon=True,
+                         args=(supervisor, args.restart_interval, stop_restarts, restarts)).start()
+    server_pid = supervisor.pid if supervisor else args.server_pid
+    stop_sampling, server_peak, sampler = threading.Event(), {"kb": 0}, None
+    if server_pid and os.path.isdir("/proc"):
+        sampler = threading.Thread(target=sample_server_rss, daemon=True,
+                                   args=(server_pid, stop_sampling, server_peak))
+        sampler.start()
+    latencies, outcomes, duration = run_load(base_url, corpus, args.clients, args.requests,
+                                             args.selected_server, args.timeout)
+    stop_restarts.set()
+    stop_sampling.set()
+    if sampler:
+        sampler.join()
+    args.restarts_sent = len(restarts)
+    result = summarize(args, latencies, outcomes, duration, local, server_peak["kb"])
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(result, previous)
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"💾 Results written to {output}")
+
+    if server:
+        server.should_exit = True
+    if supervisor:
+        supervisor.terminate()
+        supervisor.wait(timeout=120)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Stage checkpoints for idempotent /api/process-resume retries.
+A request may carry an idempotency key (Idempotency-Key header or
+idempotencyKey form field). Each completed stage result is saved under the
+key, so a retry after a quota error continues from the last completed stage
+instead of spending quota on work already done, and a retry after the
+analysis finished gets the stored result. Checkpoints expire
+CHECKPOINT_TTL_SECONDS after their last update.
+"""
+import os
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import helper_function
+import metrics
+
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", "3600"))
+MAX_CHECKPOINTS = int(os.getenv("MAX_CHECKPOINTS", "1000"))
+MAX_KEY_LENGTH = 200
+
+_lock = threading.Lock()
+# key -> {"fingerprint", "updated_at", "stages": {stage: result}, "result"}
+_records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used with a different resume or job description"""
+
+
+def clean_key(key: Optional[str]) -> Optional[str]:
+    key = (key or "").strip()
+    return key[:MAX_KEY_LENGTH] or None
+
+
+def request_fingerprint(resume_content: bytes, job_description: str) -> str:
+    """Identity of a request's inputs; the selected server may change between retries"""
+    resume_hash = hashlib.sha256(resume_content).hexdigest()
+    return f"{resume_hash}:{helper_function.job_description_key(job_description)}"
+
+
+def expire() -> None:
+    cutoff = time.monotonic() - CHECKPOINT_TTL_SECONDS
+    with _lock:
+        while _records:
+            key, record = next(iter(_records.items()))
+            if record["updated_at"] >= cutoff and len(_records) <= MAX_CHECKPOINTS:
+                break
+            del _records[key]
+
+
+def open_checkpoint(key: str, fingerprint: str) -> Dict[str, Any]:
+    """
+    Return a copy of {"stages", "result"} saved under the key, creating an empty
+    checkpoint on first use. Raises IdempotencyKeyReused if the inputs differ.
+    """
+    expire()
+    with _lock:
+        record = _records.get(key)
+        if record is None:
+            record = _records[key] = {"fingerprint": fingerprint, "updated_at": time.monotonic(),
+                                      "stages": {}, "result": None}
+        elif record["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReused(key)
+        state = "replayed" if record["result"] else "resumed" if record["stages"] else "new"
+        snapshot = copy.deepcopy({"stages": record["stages"], "result": record["result"]})
+    metrics.inc("checkpoint_requests_total", result=state)
+    if state == "replayed":
+        print("📌 Idempotency key seen before - returning the stored result")
+    elif state == "resumed":
+        print(f"📌 Idempotency key seen before - resuming after: {', '.join(snapshot['stages'])}")
+    return snapshot
+
+
+def _update(key: str, change) -> None:
+    with _lock:
+        record = _records.get(key)
+        if record is None:
+            return
+        change(record)
+        record["updated_at"] = time.monotonic()
+        _records.move_to_end(key)
+
+
+def save_stage(key: str, stage: str, value: Any) -> None:
+    """Checkpoint a completed stage result"""
+    value = copy.deepcopy(value)
+    _update(key, lambda record: record["stages"].__setitem__(stage, value))
+
+
+def save_result(key: str, result: Dict[str, Any]) -> None:
+    """Store the final response; later retries with the key get it back"""
+    result = copy.deepcopy(result)
+    _update(key, lambda record: record.update(result=result))
@@ -0,0 +1,100 @@
+"""
+Hedged LLM calls to cut tail latency.
+If a stage call has not finished after the recent p90 latency of that stage
+and model, a backup call is sent (to the same model or to the stage's
+backup_model) and the first valid parsed result wins. A budget caps the
+share of recent calls that may be hedged, so a slow period cannot double
+quota use.
+
+Hedging is off by default. Enable it with HEDGING_POLICY, either inline JSON
+or a path to a JSON file, e.g. '{"enabled": true}'; keys that are not given
+keep their defaults.
+"""
+import os
+import json
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import metrics
+
+DEFAULT_POLICY = {
+    "enabled": False,
+    # Hedge once a call has run longer than this quantile of recent latencies
+    "quantile": 0.9,
+    # Latency samples of a stage/model needed before hedging it
+    "min_samples": 20,
+    # Never hedge earlier than this, whatever the quantile says
+    "min_delay_seconds": 3,
+    # At most this share of recent hedge-eligible calls may send a backup
+    "max_hedge_ratio": 0.1,
+    "window": 200,
+    # Per-stage overrides of the keys above, plus backup_model
+    # (null: hedge to the same model)
+    "stages": {
+        "parse_resume": {"backup_model": None},
+        "parse_job_description": {"backup_model": None},
+        "comparing": {"backup_model": None},
+        "visualize_data": {"backup_model": None},
+    },
+}
+
+
+def load_policy() -> Dict:
+    policy = json.loads(json.dumps(DEFAULT_POLICY))
+    override = os.getenv("HEDGING_POLICY", "").strip()
+    if not override:
+        return policy
+    if not override.startswith("{"):
+        with open(override) as f:
+            override = f.read()
+    custom = json.loads(override)
+    for stage, rules in custom.pop("stages", {}).items():
+        policy["stages"].setdefault(stage, {}).update(rules)
+    policy.update(custom)
+    return policy
+
+
+policy = load_policy()
+
+_lock = threading.Lock()
+# True for each recent hedge-eligible call that sent a backup
+_recent_calls = deque(maxlen=policy["window"])
+
+
+def stage_rules(stage: str) -> Dict:
+    rules = {key: value for key, value in policy.items() if key != "stages"}
+    rules.update(policy["stages"].get(stage, {}))
+    return rules
+
+
+def hedge_delay(stage: str, model_name: str) -> Optional[float]:
+    """Seconds to wait before hedging a call, or None if it should not be hedged"""
+    rules = stage_rules(stage)
+    if not rules["enabled"] or stage not in policy["stages"]:
+        return None
+    if metrics.recent_sample_count(stage, model_name) < rules["min_samples"]:
+        return None
+    threshold = metrics.recent_latency_quantile(stage, model_name, rules["quantile"])
+    return max(rules["min_delay_seconds"], threshold)
+
+
+def try_hedge(stage: str) -> bool:
+    """Take a hedge from the budget; False when recent calls already used their share"""
+    with _lock:
+        hedged = sum(_recent_calls)
+        allowed = hedged < stage_rules(stage)["max_hedge_ratio"] * max(1, len(_recent_calls))
+        _recent_calls.append(allowed)
+    if not allowed:
+        metrics.inc("llm_hedges_total", stage=stage, result="over_budget")
+    return allowed
+
+
+def record_unhedged() -> None:
+    """Note a hedge-eligible call that finished before its threshold"""
+    with _lock:
+        _recent_calls.append(False)
+
+
+def backup_model(stage: str, model_name: str) -> str:
+    return stage_rules(stage).get("backup_model") or model_name
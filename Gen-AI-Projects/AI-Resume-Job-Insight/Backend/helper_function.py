@@ -1,15 +1,66 @@
+import os
 import re
+import json
+import time
 import uuid
+import hashlib
 import base64
 import datetime
-from fpdf import FPDF
-from PyPDF2 import PdfReader
-from typing import Dict, Any
-from langchain.prompts import ChatPromptTemplate
-from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from langchain_core.prompts import PromptTemplate
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, BinaryIO, List, Union
+import metrics
+
+# fpdf, PyPDF2 and langchain are imported inside the functions that use them so
+# that importing this module stays cheap; warm_up() loads them ahead of traffic.
+
+# 0. Stage prompt templates, built once on first use
+_stage_templates: Dict[tuple, tuple] = {}
+_stage_templates_lock = threading.Lock()
+
+def get_stage_template(stage: str, fields: tuple = None):
+    """
+    Return (output_parser, format_instructions, prompt_template) for a stage, building it once.
+    fields limits the output schema to those field names.
+    """
+    key = (stage, fields)
+    template = _stage_templates.get(key)
+    if template is None:
+        with _stage_templates_lock:
+            template = _stage_templates.get(key)
+            if template is None:
+                template = _stage_templates[key] = _build_stage_template(stage, fields)
+    return template
+
+def _build_stage_template(stage: str, fields: tuple = None):
+    from langchain.prompts import ChatPromptTemplate
+    from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+    from langchain_core.prompts import PromptTemplate
+
+    schema, template_text, input_variables = STAGE_TEMPLATES[stage]
+    if fields:
+        schema = [(name, description) for name, description in schema if name in fields]
+    output_parser = StructuredOutputParser.from_response_schemas(
+        [ResponseSchema(name=name, description=description) for name, description in schema]
+    )
+    if input_variables is None:
+        prompt_template = ChatPromptTemplate.from_template(template_text)
+    else:
+        prompt_template = PromptTemplate(template=template_text, input_variables=input_variables)
+    return output_parser, output_parser.get_format_instructions(), prompt_template
+
+def warm_up() -> None:
+    """Import the heavy dependencies and build every stage template ahead of traffic"""
+    import fpdf  # noqa: F401
+    import PyPDF2  # noqa: F401
+    for stage in STAGE_TEMPLATES:
+        get_stage_template(stage)
+
 # 1. Extract text from PDF
-def extract_text_from_pdf(pdf_path: str) -> str:
+def extract_text_from_pdf(pdf_path: Union[str, BinaryIO]) -> str:
+    """Extract text from a PDF file path or binary stream"""
+    from PyPDF2 import PdfReader
+
     reader = PdfReader(pdf_path)
     text = ""
     for page in reader.pages:
@@ -17,26 +68,22 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     return text
 
 # 2. Define function to parse resume using LLM
-def parse_resume_with_llm(text: str):
-    response_schemas = [
-        ResponseSchema(name="Name", description="Full name of the candidate"),
-        ResponseSchema(name="Email", description="Email address of the candidate"),
-        ResponseSchema(name="Phone", description="Phone number of the candidate"),
-        ResponseSchema(name="LinkedIn", description="LinkedIn profile URL if available"),
-        ResponseSchema(name="Address", description="Address or location of the candidate"),
-        ResponseSchema(name="Experience Level", description="by resume text, categorize as Entry-level, Mid-level, Senior-level, or Executive"),
-        ResponseSchema(name="Education", description="latest education details ongoing or completed(only name of degree and year/ongoing)"),
-        ResponseSchema(name="Skills", description="List of technical skills"),
-        ResponseSchema(name="Achievements", description="List of achievements"),
-        ResponseSchema(name="Work Experience", description="year of experience as position and field"),
-        ResponseSchema(name="Projects", description="List of projects"),
-        ResponseSchema(name="Certificates", description="List of certificates")
-    ]
-
-    output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    format_instructions = output_parser.get_format_instructions()
-
-    prompt = ChatPromptTemplate.from_template("""
+RESUME_SCHEMA = [
+    ("Name", "Full name of the candidate"),
+    ("Email", "Email address of the candidate"),
+    ("Phone", "Phone number of the candidate"),
+    ("LinkedIn", "LinkedIn profile URL if available"),
+    ("Address", "Address or location of the candidate"),
+    ("Experience Level", "by resume text, categorize as Entry-level, Mid-level, Senior-level, or Executive"),
+    ("Education", "latest education details ongoing or completed(only name of degree and year/ongoing)"),
+    ("Skills", "List of technical skills"),
+    ("Achievements", "List of achievements"),
+    ("Work Experience", "year of experience as position and field"),
+    ("Projects", "List of projects"),
+    ("Certificates", "List of certificates"),
+]
+
+RESUME_TEMPLATE = """
     You are a professional resume parser. You MUST return ONLY valid JSON in the exact format specified below.
 
     CRITICAL INSTRUCTIONS:
@@ -52,8 +99,13 @@ def parse_resume_with_llm(text: str):
     {resume_text}
 
     Remember: Return ONLY the JSON object with no additional formatting or text.
-    """)
+    """
+
+def parse_resume_with_llm(text: str):
+    output_parser, format_instructions, prompt = get_stage_template("parse_resume")
 
+    # Parsing sees the whole resume: a field may sit under a heading the
+    # segmenter does not know, or under none at all
     prompt = prompt.format_messages(
         resume_text=text,
         format_instructions=format_instructions
@@ -69,28 +121,17 @@ def contains_link(text: str) -> bool:
 
 
 # 4. Define function to parse job description using LLM
-def job_description(text: str):
-    con_link = contains_link(text)
-    if con_link:
-        desc = 'The job description is provided as a link. Please visit the link to view the full job description.'
-    else:
-        desc = 'The job description is provided as text.'
-
-    response_schema = [
-        ResponseSchema(name="Job Title", description="Title of the job position"),
-        ResponseSchema(name="Employment Type", description="Type of employment (Full-time/Part-time/Contract, etc.)"),
-        ResponseSchema(name="Responsibilities", description="List of job responsibilities"),
-        ResponseSchema(name="Required Skills", description="List of required skills for the job"),
-        ResponseSchema(name="Qualifications", description="List of qualifications needed for the job"),
-        ResponseSchema(name="Experience Level", description="Experience level required (if mentioned), give the original values which are present on description"),
-        ResponseSchema(name="Year of Experience", description="Years of experience required (if mentioned), give the original values which are present on description"),
-    ]
-    
-    output_parser = StructuredOutputParser.from_response_schemas(response_schema)
-    format_instructions = output_parser.get_format_instructions()
-    
-    template = PromptTemplate(
-        template="""
+JOB_SCHEMA = [
+    ("Job Title", "Title of the job position"),
+    ("Employment Type", "Type of employment (Full-time/Part-time/Contract, etc.)"),
+    ("Responsibilities", "List of job responsibilities"),
+    ("Required Skills", "List of required skills for the job"),
+    ("Qualifications", "List of qualifications needed for the job"),
+    ("Experience Level", "Experience level required (if mentioned), give the original values which are present on description"),
+    ("Year of Experience", "Years of experience required (if mentioned), give the original values which are present on description"),
+]
+
+JOB_TEMPLATE = """
         You are a professional job description analyzer.
         {desc}
 
@@ -99,9 +140,18 @@ def job_description(text: str):
         Extract and return in structured format:
         {format_instructions}
         Remember: Return ONLY the JSON object with no additional formatting or text.
-        """,
-        input_variables=["job_description", "format_instructions"],
-    )
+        """
+
+def job_description(text: str, source_url: str = None):
+    con_link = contains_link(text)
+    if source_url:
+        desc = f'The job description below was fetched from {source_url}.'
+    elif con_link:
+        desc = 'The job description is provided as a link. Please visit the link to view the full job description.'
+    else:
+        desc = 'The job description is provided as text.'
+
+    output_parser, format_instructions, template = get_stage_template("parse_job_description")
     
     prompt = template.format_prompt(
         desc=desc,
@@ -110,23 +160,18 @@ def job_description(text: str):
     )
     return output_parser, prompt
 # 5. Define function to compare resume and job description
-def comparing(resume: dict, jobdes: dict):
-    response_schema = [
-        ResponseSchema(name="Match Percentage", description="Percentage match between resume and job description (provide only the number)"),
-        ResponseSchema(name="Missing Skills", description="Skills mentioned in the job description but same skills not found in the resume"),
-        ResponseSchema(name="Matching Skills", description="Skills that match between resume and job description"),
-        ResponseSchema(name="Suggested Improvements", description="Specific suggestions to improve the resume"),
-        ResponseSchema(name="Interview Q&A", description="Top 5 interview questions and answers based on the job description"),
-        ResponseSchema(name="ATS-optimized keyword list", description="List of keywords to optimize for ATS systems"),
-        ResponseSchema(name="Suggested rewrites", description="Rewritten sentences or sections to better match the job description"),
-        ResponseSchema(name="Confidence scores", description="Provide Confidence scores and allow users to accept/modify the generated resume and export (PDF/DOCX)."),
-    ]
-    
-    output_parser = StructuredOutputParser.from_response_schemas(response_schema)
-    format_instructions = output_parser.get_format_instructions()
-    
-    template = PromptTemplate(
-        template="""You are a Professional job interviewer who has 15+ years of experience. You MUST return ONLY valid JSON in the exact format specified.
+COMPARING_SCHEMA = [
+    ("Match Percentage", "Percentage match between resume and job description (provide only the number)"),
+    ("Missing Skills", "Skills mentioned in the job description but same skills not found in the resume"),
+    ("Matching Skills", "Skills that match between resume and job description"),
+    ("Suggested Improvements", "Specific suggestions to improve the resume"),
+    ("Interview Q&A", "Top 5 interview questions and answers based on the job description"),
+    ("ATS-optimized keyword list", "List of keywords to optimize for ATS systems"),
+    ("Suggested rewrites", "Rewritten sentences or sections to better match the job description"),
+    ("Confidence scores", "Provide Confidence scores and allow users to accept/modify the generated resume and export (PDF/DOCX)."),
+]
+
+COMPARING_TEMPLATE = """You are a Professional job interviewer who has 15+ years of experience. You MUST return ONLY valid JSON in the exact format specified.
 
         CRITICAL INSTRUCTIONS:
         1. Return ONLY valid JSON - no additional text
@@ -149,35 +194,31 @@ def comparing(resume: dict, jobdes: dict):
         {format_instructions}
 
         Remember: Return ONLY the JSON object with no additional formatting or text.
-        """,
-        input_variables=["resume", "jobdes", "format_instructions"],
-    )
+        """
+
+def comparing(resume: dict, jobdes: dict):
+    output_parser, format_instructions, template = get_stage_template("comparing")
     
     prompt = template.format_prompt(
-        resume=resume,
+        resume=select_resume_fields(resume, "comparing"),
         jobdes=jobdes,
         format_instructions=format_instructions
     )
     return output_parser, prompt
 
 # 6. Define function to visualize data for analysis
-def visualize_data(resume, jobdes):
-    response_schemas = [
-        ResponseSchema(name="visual Match Percentage", description="Integer 0-100 representing overall match percentage"),
-        ResponseSchema(name="visual Missing / Weak Skills", description="List of strings of skills missing or weak in resume"),
-        ResponseSchema(name="visual Confidence scores", description="Object mapping categories to scores between 0 and 1"),
-        ResponseSchema(name="visual Resume Skills", description="List of skills extracted from the resume"),
-        ResponseSchema(name="visual Job Skills", description="List of skills extracted from the job description"),
-        ResponseSchema(name="visual Candidate Experience (years)", description="Number of years of candidate experience (int or float)"),
-        ResponseSchema(name="visual Required Experience (years)", description="Number of years required by the job (int or float)"),
-        ResponseSchema(name="visual Resume Sections", description="Object mapping resume section names to numeric weights or percentages"),
-    ]
-
-    output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    format_instructions = output_parser.get_format_instructions()
-
-    prompt_template = PromptTemplate(
-        template="""You are a precise JSON-outputting assistant. You MUST return ONLY valid JSON in the exact format specified.
+VISUAL_SCHEMA = [
+    ("visual Match Percentage", "Integer 0-100 representing overall match percentage"),
+    ("visual Missing / Weak Skills", "List of strings of skills missing or weak in resume"),
+    ("visual Confidence scores", "Object mapping categories to scores between 0 and 1"),
+    ("visual Resume Skills", "List of skills extracted from the resume"),
+    ("visual Job Skills", "List of skills extracted from the job description"),
+    ("visual Candidate Experience (years)", "Number of years of candidate experience (int or float)"),
+    ("visual Required Experience (years)", "Number of years required by the job (int or float)"),
+    ("visual Resume Sections", "Object mapping resume section names to numeric weights or percentages"),
+]
+
+VISUAL_TEMPLATE = """You are a precise JSON-outputting assistant. You MUST return ONLY valid JSON in the exact format specified.
 
 CRITICAL INSTRUCTIONS:
 1. Return ONLY valid JSON - no additional text, explanations, or markdown
@@ -200,17 +241,159 @@ REQUIREMENTS:
 - All experience values should be numeric
 
 Remember: Return ONLY the JSON object with no additional formatting or text.
-""",
-        input_variables=["resume_text", "job_text", "format_instructions"]
-    )
+"""
+
+def visualize_data(resume, jobdes, sections: Dict[str, str] = None, fields: list = None):
+    """Prompt for the visualization fields (only the given fields if set)"""
+    output_parser, format_instructions, prompt_template = get_stage_template(
+        "visualize_data", tuple(fields) if fields else None)
+
+    resume_input = select_resume_fields(resume, "visualize_data")
+    if sections and isinstance(resume_input, dict):
+        # Section sizes are enough for "visual Resume Sections" without the section text
+        resume_input["Resume Sections"] = {name: len(body) for name, body in sections.items()}
 
     prompt = prompt_template.format_prompt(
-        resume_text=str(resume),
-        job_text=str(jobdes),
+        resume_text=str(resume_input),
+        job_text=str(select_job_fields(jobdes, "visualize_data")),
         format_instructions=format_instructions
     )
     return output_parser, prompt
 
+# Most of visualization_data repeats what the parsed resume, parsed job description
+# and comparison already hold, so it is derived locally; only fields that cannot
+# be derived go to the LLM.
+LIST_SPLIT_PATTERN = re.compile(r"[,;\n\u2022]+")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+YEARS_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*\+?\s*(?:years?|yrs?)", re.IGNORECASE)
+EXPERIENCE_RANGE_PATTERN = re.compile(
+    r"\b((?:19|20)\d\d)\s*(?:-|\u2013|\u2014|to)\s*((?:19|20)\d\d|present|current|now)\b", re.IGNORECASE)
+
+def _as_list(value) -> list:
+    """Skills and similar fields as a de-duplicated list of strings"""
+    if isinstance(value, dict):
+        value = list(value)
+    if isinstance(value, str):
+        value = LIST_SPLIT_PATTERN.split(value)
+    if not isinstance(value, (list, tuple)):
+        return []
+    items, seen = [], set()
+    for item in value:
+        text = str(item).strip(" \t-*")
+        if text and text.lower() not in seen:
+            seen.add(text.lower())
+            items.append(text)
+    return items
+
+def _first_number(value):
+    match = NUMBER_PATTERN.search(str(value)) if value not in (None, "") else None
+    if not match:
+        return None
+    number = float(match.group())
+    return int(number) if number.is_integer() else number
+
+def candidate_experience_years(resume: Dict):
+    """Years of experience from the date ranges in Work Experience (overlaps counted once)"""
+    text = str(resume.get("Work Experience", "")) if isinstance(resume, dict) else ""
+    current_year = datetime.date.today().year
+    ranges = []
+    for start, end in EXPERIENCE_RANGE_PATTERN.findall(text):
+        end_year = int(end) if end.isdigit() else current_year
+        if int(start) <= end_year:
+            ranges.append((int(start), end_year))
+    if ranges:
+        total, covered_until = 0, None
+        for start, end in sorted(ranges):
+            if covered_until is not None:
+                start = max(start, covered_until)
+            total += max(0, end - start)
+            covered_until = max(end, covered_until or end)
+        return total
+    years = [float(value) for value in YEARS_PATTERN.findall(text)]
+    return _first_number(max(years)) if years else None
+
+def required_experience_years(jobdes: Dict):
+    """Minimum years the job asks for, from Year of Experience or Experience Level"""
+    if not isinstance(jobdes, dict):
+        return None
+    for field in ("Year of Experience", "Experience Level"):
+        years = _first_number(jobdes.get(field))
+        if years is not None:
+            return years
+    return None
+
+def _confidence_scores(comparison: Dict, match_percentage, resume_skills, job_skills, candidate_years, required_years):
+    scores = comparison.get("Confidence scores") if isinstance(comparison, dict) else None
+    if isinstance(scores, dict):
+        numeric = {str(key): _first_number(value) for key, value in scores.items()}
+        if numeric and all(value is not None for value in numeric.values()):
+            return {key: round(min(1.0, value / 100 if value > 1 else value), 2) for key, value in numeric.items()}
+
+    derived = {}
+    if match_percentage is not None:
+        derived["Overall match"] = round(match_percentage / 100, 2)
+    if job_skills:
+        resume_lower = {skill.lower() for skill in resume_skills}
+        derived["Skills match"] = round(sum(skill.lower() in resume_lower for skill in job_skills) / len(job_skills), 2)
+    if candidate_years is not None and required_years:
+        derived["Experience match"] = round(min(1.0, candidate_years / required_years), 2)
+    return derived or None
+
+def build_visualization_data(resume: Dict, jobdes: Dict, comparison: Dict = None,
+                             sections: Dict[str, str] = None):
+    """
+    Derive visualization_data (VISUAL_SCHEMA) from results the pipeline already has.
+    Returns (data, missing_fields); missing fields are the ones that could not be derived.
+    """
+    resume = resume if isinstance(resume, dict) else {}
+    jobdes = jobdes if isinstance(jobdes, dict) else {}
+    comparison = comparison if isinstance(comparison, dict) else {}
+
+    resume_skills = _as_list(resume.get("Skills"))
+    job_skills = _as_list(jobdes.get("Required Skills"))
+    match_percentage = _first_number(clean_percentage(comparison.get("Match Percentage")))
+    if match_percentage is not None:
+        match_percentage = max(0, min(100, round(match_percentage)))
+
+    if "Missing Skills" in comparison:
+        missing_skills = _as_list(comparison["Missing Skills"])
+    elif resume_skills and job_skills:
+        resume_lower = {skill.lower() for skill in resume_skills}
+        missing_skills = [skill for skill in job_skills if skill.lower() not in resume_lower]
+    else:
+        missing_skills = None
+
+    candidate_years = candidate_experience_years(resume)
+    required_years = required_experience_years(jobdes)
+
+    section_sizes = {name: len(body) for name, body in (sections or {}).items() if name != "Header"}
+    total_size = sum(section_sizes.values())
+    resume_sections = ({name: round(100 * size / total_size) for name, size in section_sizes.items()}
+                       if total_size else None)
+
+    values = {
+        "visual Match Percentage": match_percentage,
+        "visual Missing / Weak Skills": missing_skills,
+        "visual Confidence scores": _confidence_scores(comparison, match_percentage, resume_skills,
+                                                       job_skills, candidate_years, required_years),
+        "visual Resume Skills": resume_skills or None,
+        "visual Job Skills": job_skills or None,
+        "visual Candidate Experience (years)": candidate_years,
+        "visual Required Experience (years)": required_years,
+        "visual Resume Sections": resume_sections,
+    }
+    data = {field: value for field, value in values.items() if value is not None}
+    missing = [field for field, _ in VISUAL_SCHEMA if field not in data]
+    return data, missing
+
+# (schema, template, input variables or None for a chat template) per stage
+STAGE_TEMPLATES = {
+    "parse_resume": (RESUME_SCHEMA, RESUME_TEMPLATE, None),
+    "parse_job_description": (JOB_SCHEMA, JOB_TEMPLATE, ["job_description", "format_instructions"]),
+    "comparing": (COMPARING_SCHEMA, COMPARING_TEMPLATE, ["resume", "jobdes", "format_instructions"]),
+    "visualize_data": (VISUAL_SCHEMA, VISUAL_TEMPLATE, ["resume_text", "job_text", "format_instructions"]),
+}
+
 # 7. Create PDF resume function
 def create_resume_pdf(resume_data: dict, file_name: str = "resume.pdf") -> tuple[bool, str]:
     """
@@ -218,6 +401,8 @@ def create_resume_pdf(resume_data: dict, file_name: str = "resume.pdf") -> tuple
     Returns: (success: bool, base64_pdf_data: str or error_message: str)
     """
     try:
+        from fpdf import FPDF
+
         def clean_unicode_text(text):
             """Clean Unicode characters that can't be encoded in latin-1"""
             if not isinstance(text, str):
@@ -248,57 +433,14 @@ def create_resume_pdf(resume_data: dict, file_name: str = "resume.pdf") -> tuple
                 return personal_info
             
             # Fallback: Extract from full resume text
-            full_text = ""
-            for key, value in resume_data.items():
-                if isinstance(value, str):
-                    full_text += value + " "
-            
-            # Extract email addresses
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            emails = re.findall(email_pattern, full_text)
-            email = emails[0] if emails else None
-            
-            # Extract phone numbers
-            phone_patterns = [
-                r'\+?1?[-.\s]?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})',
-                r'\+?[0-9]{1,4}[-.\s]?[0-9]{3,4}[-.\s]?[0-9]{3,4}[-.\s]?[0-9]{3,4}',
-                r'\b\d{10}\b'
-            ]
-            phone = None
-            for pattern in phone_patterns:
-                phone_matches = re.findall(pattern, full_text)
-                if phone_matches:
-                    phone = phone_matches[0] if isinstance(phone_matches[0], str) else ''.join(phone_matches[0])
-                    break
-            
-            # Extract LinkedIn
-            linkedin_pattern = r'linkedin\.com/in/[\w-]+'
-            linkedin_match = re.search(linkedin_pattern, full_text.lower())
-            linkedin = f"https://{linkedin_match.group()}" if linkedin_match else None
-            
-            # Extract name
-            name = None
-            if 'Name:' in full_text:
-                name_match = re.search(r'Name:\s*([A-Z][a-z]+ [A-Z][a-z]+)', full_text)
-                if name_match:
-                    name = name_match.group(1)
-            else:
-                name_patterns = [
-                    r'([A-Z][a-z]+ [A-Z][a-z]+)',
-                    r'([A-Z][a-z]+ [A-Z]\. [A-Z][a-z]+)',
-                    r'([A-Z][a-z]+ [A-Z][a-z]+ [A-Z][a-z]+)'
-                ]
-                for pattern in name_patterns:
-                    name_match = re.search(pattern, full_text)
-                    if name_match:
-                        name = name_match.group(1)
-                        break
+            full_text = " ".join(value for value in resume_data.values() if isinstance(value, str))
+            fields = extract_resume_fields(full_text)
             
             return {
-                'name': name or 'Professional Candidate',
-                'email': email,
-                'phone': phone,
-                'linkedin': linkedin
+                'name': fields['name'] or 'Professional Candidate',
+                'email': fields['email'],
+                'phone': fields['phone'],
+                'linkedin': fields['linkedin']
             }
 
         # Create PDF object
@@ -504,53 +646,502 @@ def create_resume_pdf(resume_data: dict, file_name: str = "resume.pdf") -> tuple
 # -----------------------------------
 # Personal Info Extraction
 # -----------------------------------
+# The text is scanned exactly once with finditer and never copied. Contact
+# details usually live in the header, so the first HEADER_SCAN_CHARS (or less,
+# once every contact field is found) are scanned with the full contact pattern.
+# An email or phone that PDF extraction placed later (a sidebar column, a
+# footer) is still looked for in the rest of the text until both are found;
+# after that only the link pattern runs. Every link alternative
+# starts with a literal character and tags itself with an empty marker group at
+# the end, which lets the regex engine skip ahead on its first-character
+# charset instead of trying each alternative at every position.
+HEADER_SCAN_CHARS = 3000
+
+LINK_ALTERNATIVES = r"""
+    https?://[^\s<>"')]+(?P<url>)
+  | www\.[^\s<>"')]+(?P<www>)
+  | l(?i:inkedin\.com/in/)[\w-]+(?P<linkedin>)
+  | L(?i:inkedin\.com/in/)[\w-]+(?P<linkedin_title>)
+  | 19\d\d[ \t]*(?:-|\u2013|\u2014|to)[ \t]*(?:(?:19|20)\d\d|(?i:present|current|now))\b(?P<years_19>)
+  | 20\d\d[ \t]*(?:-|\u2013|\u2014|to)[ \t]*(?:(?:19|20)\d\d|(?i:present|current|now))\b(?P<years_20>)
+"""
+
+# A month-year date such as the "06.2018" of "06.2018 - 09.2020": a phone
+# candidate holding one is a date span, not a phone number
+PHONE_DATE_PATTERN = re.compile(r"(?<!\d)\d{1,2}[./](?:19|20)\d\d(?!\d)")
+
+RESUME_LINK_PATTERN = re.compile(LINK_ALTERNATIVES, re.VERBOSE)
+RESUME_CONTACT_PATTERN = re.compile(r"""
+    \b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b(?P<email>)
+  | """ + LINK_ALTERNATIVES + r"""
+  | \+?\(?\d[\d \t().-]{5,18}\d(?P<phone>)
+  | Name:[ \t]*(?P<labelled_name>[A-Z][a-z]+[ ][A-Z][a-z]+)
+  | \b[A-Z][a-z]+(?:[ ][A-Z]\.)?(?:[ ][A-Z][a-z]+){1,2}\b(?P<name>)
+""", re.VERBOSE)
+
+# Outside the header: links, phones and emails in one pattern whose alternatives
+# all start with a literal or a character class, so the engine can skip ahead.
+# Emails are matched from their "@" and extended back to the local part.
+RESUME_BODY_CONTACT_PATTERN = re.compile(LINK_ALTERNATIVES + r"""
+  | [+(\d][\d \t().-]{5,18}\d(?P<phone>)
+  | @[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b(?P<email_domain>)
+""", re.VERBOSE)
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+EMAIL_LOCAL_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+
+PHONE_SEPARATORS = str.maketrans("", "", " \t-.()")
+YEAR_RANGE_SEPARATORS = " \t-\u2013\u2014to"
+CONTACT_FIELDS = ("name", "email", "phone", "linkedin")
+
+
+def _email_ending_at(text: str, domain_match):
+    """Email whose "@domain" part domain_match matched, or None if no local part precedes it"""
+    at = domain_match.start()
+    begin = at
+    while begin > 0 and text[begin - 1] in EMAIL_LOCAL_CHARS:
+        begin -= 1
+    match = EMAIL_PATTERN.match(text, begin) if begin < at else None
+    return match.group() if match else None
+
+
+def extract_resume_fields(text: str) -> Dict[str, Any]:
+    """
+    Extract contact fields, candidate name, URLs and year ranges from resume text
+    in a single pass over the text with precompiled patterns.
+    """
+    fields: Dict[str, Any] = {
+        "name": None,
+        "email": None,
+        "phone": None,
+        "linkedin": None,
+        "urls": [],
+        "year_ranges": [],
+    }
+    labelled_name = None
+
+    def add_link(kind, match):
+        value = match.group()
+        if kind in ("url", "www"):
+            value = value.rstrip(".,;:")
+            fields["urls"].append(value)
+            lowered = value.lower()
+            if "linkedin.com/in/" not in lowered:
+                return
+            value = lowered[lowered.index("linkedin.com/in/"):]
+        if kind.startswith(("linkedin", "url", "www")):
+            if not fields["linkedin"]:
+                profile = value.lower().split("?")[0].split("#")[0].rstrip("/")
+                fields["linkedin"] = f"https://{profile}"
+        elif match.start() == 0 or not text[match.start() - 1].isalnum():
+            fields["year_ranges"].append((value[:4], value[4:].lstrip(YEAR_RANGE_SEPARATORS)))
+
+    header_end = text.find("\n", HEADER_SCAN_CHARS)
+    if header_end == -1:
+        header_end = len(text)
+
+    def add_contact(kind, match):
+        if kind == "email":
+            fields["email"] = fields["email"] or match.group()
+        elif kind == "email_domain":
+            fields["email"] = fields["email"] or _email_ending_at(text, match)
+        elif kind == "phone":
+            if not fields["phone"] and not PHONE_DATE_PATTERN.search(match.group()):
+                digits = match.group().translate(PHONE_SEPARATORS)
+                if 7 <= len(digits.lstrip("+")) <= 15:
+                    fields["phone"] = digits
+        else:
+            add_link(kind, match)
+
+    position = header_end
+    for match in RESUME_CONTACT_PATTERN.finditer(text, 0, header_end):
+        kind = match.lastgroup
+        if kind == "labelled_name":
+            labelled_name = labelled_name or match.group(kind)
+        elif kind == "name":
+            fields["name"] = fields["name"] or match.group()
+        else:
+            add_contact(kind, match)
+
+        if all(fields[key] for key in CONTACT_FIELDS):
+            position = match.end()
+            break
+
+    # The rest of the text in one scan: links and year ranges throughout, plus any
+    # email or phone number the header window did not have
+    if fields["email"] and fields["phone"]:
+        body_pattern = RESUME_LINK_PATTERN
+    else:
+        body_pattern = RESUME_BODY_CONTACT_PATTERN
+    for match in body_pattern.finditer(text, position):
+        add_contact(match.lastgroup, match)
+
+    if labelled_name:
+        fields["name"] = labelled_name
+    return fields
+
+
 def extract_personal_info_from_text(text: str) -> Dict[str, str]:
     """Extract basic personal information from resume text"""
-    personal_info = {}
-    
-    # Extract email
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    email_match = re.search(email_pattern, text)
-    if email_match:
-        personal_info['email'] = email_match.group()
-    
-    # Extract phone (basic patterns)
-    phone_pattern = r'[\+]?[1-9]?[0-9]{7,15}'
-    phone_match = re.search(phone_pattern, text.replace('-', '').replace(' ', ''))
-    if phone_match:
-        personal_info['phone'] = phone_match.group()
-    
-    # Extract LinkedIn
-    linkedin_pattern = r'linkedin\.com/in/[\w-]+'
-    linkedin_match = re.search(linkedin_pattern, text.lower())
-    if linkedin_match:
-        personal_info['linkedin'] = f"https://{linkedin_match.group()}"
-    
-    return personal_info
+    fields = extract_resume_fields(text)
+    return {key: fields[key] for key in ("email", "phone", "linkedin") if fields[key]}
+
+# -----------------------------------
+# Resume Section Segmentation
+# -----------------------------------
+SECTION_HEADINGS = {
+    "Summary": ("summary", "professional summary", "profile", "about me", "objective", "career objective"),
+    "Education": ("education", "academic background", "educational background", "academics"),
+    "Experience": ("experience", "work experience", "professional experience", "employment history",
+                   "work history", "employment", "internships", "internship experience"),
+    "Skills": ("skills", "technical skills", "key skills", "core competencies", "technologies", "tech stack"),
+    "Projects": ("projects", "personal projects", "academic projects", "key projects"),
+    "Certificates": ("certificates", "certifications", "licenses & certifications", "courses"),
+    "Achievements": ("achievements", "awards", "honors", "honors & awards", "accomplishments"),
+    "Publications": ("publications", "research"),
+    "Languages": ("languages",),
+    "Interests": ("interests", "hobbies", "hobbies & interests"),
+    "References": ("references",),
+}
+
+HEADING_ALIASES = {alias: section for section, aliases in SECTION_HEADINGS.items() for alias in aliases}
+
+# A heading is a short line made only of a known alias, optionally bulleted,
+# numbered or followed by a colon. Longest aliases first so "work experience"
+# wins over "experience".
+SECTION_HEADING_PATTERN = re.compile(
+    r"^[ \t]*(?:[#*\u2022\-]+[ \t]*|\d+\.[ \t]*)?(?P<heading>"
+    + "|".join(re.escape(alias) for alias in sorted(HEADING_ALIASES, key=len, reverse=True))
+    + r")[ \t]*:?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Resume sections each downstream stage needs in its prompt. "Header" is the
+# text above the first detected heading (name and contact details). Resume
+# parsing always gets the whole text.
+STAGE_RESUME_SECTIONS = {
+    "comparing": ("Summary", "Education", "Experience", "Skills", "Projects", "Certificates", "Achievements"),
+    "visualize_data": ("Experience", "Skills"),
+}
+
+# Parsed resume fields that come out of each section.
+SECTION_RESUME_FIELDS = {
+    "Header": ("Name", "Email", "Phone", "LinkedIn", "Address"),
+    "Summary": ("Experience Level",),
+    "Education": ("Education",),
+    "Experience": ("Work Experience", "Experience Level"),
+    "Skills": ("Skills",),
+    "Projects": ("Projects",),
+    "Certificates": ("Certificates",),
+    "Achievements": ("Achievements",),
+}
+
+# Parsed job description fields each stage needs in its prompt.
+STAGE_JOB_FIELDS = {
+    "visualize_data": ("Job Title", "Required Skills", "Experience Level", "Year of Experience"),
+}
+
+
+def segment_resume_sections(text: str) -> Dict[str, str]:
+    """
+    Split resume text into sections by heading detection.
+    Returns an ordered {section: text} dict; text before the first heading is
+    stored under "Header" and repeated headings are merged.
+    """
+    sections: Dict[str, str] = {}
+    current, start = "Header", 0
+
+    for match in SECTION_HEADING_PATTERN.finditer(text):
+        body = text[start:match.start()].strip()
+        if body:
+            sections[current] = f"{sections[current]}\n{body}" if current in sections else body
+        current = HEADING_ALIASES[match.group("heading").lower()]
+        start = match.end()
+
+    body = text[start:].strip()
+    if body:
+        sections[current] = f"{sections[current]}\n{body}" if current in sections else body
+    return sections
+
+
+def select_resume_fields(resume: Dict, stage: str) -> Dict:
+    """Keep only the parsed resume fields a stage needs"""
+    if not isinstance(resume, dict):
+        return resume
+    wanted = {field for section in STAGE_RESUME_SECTIONS[stage] for field in SECTION_RESUME_FIELDS.get(section, ())}
+    return {key: value for key, value in resume.items() if key in wanted}
+
+
+def select_job_fields(jobdes: Dict, stage: str) -> Dict:
+    """Keep only the parsed job description fields a stage needs"""
+    if not isinstance(jobdes, dict) or stage not in STAGE_JOB_FIELDS:
+        return jobdes
+    return {key: value for key, value in jobdes.items() if key in STAGE_JOB_FIELDS[stage]}
+
+
+# -----------------------------------
+# Chunked Parsing of Long Inputs
+# -----------------------------------
+# A resume or job description longer than CHUNK_THRESHOLD_CHARS is parsed in
+# chunks of about CHUNK_TARGET_CHARS, cut at section (or line) boundaries. The
+# chunks are parsed in parallel, each resume chunk only for the fields its
+# sections hold, and merge_chunk_results() combines the partial results locally.
+CHUNK_THRESHOLD_CHARS = int(os.getenv("PARSE_CHUNK_THRESHOLD_CHARS", "12000"))
+CHUNK_TARGET_CHARS = int(os.getenv("PARSE_CHUNK_CHARS", "6000"))
+
+SENIORITY_LEVELS = ("entry", "mid", "senior", "executive")
+
+# List fields every resume chunk asks for beyond SECTION_RESUME_FIELDS: skills,
+# projects and the like turn up under any heading (experience entries, an
+# unrecognised "Technical Profile" merged into the previous section), and
+# merged lists cannot be polluted by an empty answer
+CHUNK_LIST_FIELDS = ("Skills", "Achievements", "Projects", "Certificates")
+
+# Scalar fields not merged by taking the first non-empty value
+CHUNK_MERGE_RULES = {
+    "parse_resume": {"Experience Level": "most_senior", "Work Experience": "join"},
+    "parse_job_description": {},
+}
+
+
+def _split_lines(text: str, limit: int) -> List[str]:
+    """Split text into pieces of at most about limit characters at line boundaries"""
+    pieces, current, size = [], [], 0
+    for line in text.splitlines():
+        if current and size + len(line) > limit:
+            pieces.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def _pack_blocks(blocks: List[tuple], limit: int) -> List[tuple]:
+    """Pack (text, section) blocks in order into (text, sections) chunks of about limit characters"""
+    chunks, texts, sections, size = [], [], set(), 0
+    for text, section in blocks:
+        if texts and size + len(text) > limit:
+            chunks.append(("\n\n".join(texts), sections))
+            texts, sections, size = [], set(), 0
+        texts.append(text)
+        sections.add(section)
+        size += len(text) + 2
+    if texts:
+        chunks.append(("\n\n".join(texts), sections))
+    return chunks
+
+
+def resume_chunk_prompts(text: str, sections: Dict[str, str] = None) -> List[tuple]:
+    """
+    (output_parser, prompt) per chunk of a long resume, or [] when the resume fits one prompt.
+    Every section is parsed; each chunk asks only for the fields its sections hold.
+    """
+    if len(text) <= CHUNK_THRESHOLD_CHARS:
+        return []
+    if sections is None:
+        sections = segment_resume_sections(text)
+
+    if set(sections) <= {"Header"}:
+        # No headings detected: line-based chunks, each asked for the full schema
+        blocks = [(piece, None) for piece in _split_lines(text, CHUNK_TARGET_CHARS)]
+    else:
+        blocks = []
+        for name, body in sections.items():
+            # A section longer than a chunk is cut at line boundaries, its heading repeated
+            for piece in _split_lines(body, CHUNK_TARGET_CHARS):
+                blocks.append((piece if name == "Header" else f"{name.upper()}\n{piece}", name))
+
+    prompts = []
+    for chunk_text, chunk_sections in _pack_blocks(blocks, CHUNK_TARGET_CHARS):
+        if None in chunk_sections:
+            fields = None
+        else:
+            wanted_fields = {field for name in chunk_sections for field in SECTION_RESUME_FIELDS.get(name, ())}
+            wanted_fields.update(CHUNK_LIST_FIELDS)
+            fields = tuple(field for field, _ in RESUME_SCHEMA if field in wanted_fields)
+        output_parser, format_instructions, prompt = get_stage_template("parse_resume", fields)
+        prompts.append((output_parser, prompt.format_messages(
+            resume_text=chunk_text,
+            format_instructions=format_instructions
+        )))
+    return prompts
+
+
+def job_description_chunk_prompts(text: str, source_url: str = None) -> List[tuple]:
+    """(output_parser, prompt) per chunk of a long job description, or [] when it fits one prompt"""
+    if len(text) <= CHUNK_THRESHOLD_CHARS:
+        return []
+    blocks = [(piece, None) for piece in _split_lines(text, CHUNK_TARGET_CHARS)]
+    return [job_description(chunk_text, source_url) for chunk_text, _ in _pack_blocks(blocks, CHUNK_TARGET_CHARS)]
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _most_senior(values: list):
+    def rank(value):
+        lowered = str(value).lower()
+        return max((index for index, level in enumerate(SENIORITY_LEVELS) if level in lowered), default=-1)
+    return max(values, key=rank)
+
+
+def merge_chunk_results(stage: str, partials: List[Dict]) -> Dict:
+    """
+    Reduce step of chunked parsing: merge per-chunk results into one result for the
+    stage schema. Lists are concatenated without duplicates; scalars take the first
+    non-empty value (chunks are in document order) unless CHUNK_MERGE_RULES says otherwise.
+    """
+    schema = STAGE_TEMPLATES[stage][0]
+    rules = CHUNK_MERGE_RULES.get(stage, {})
+    merged = {}
+    for field, description in schema:
+        values = [partial.get(field) for partial in partials
+                  if isinstance(partial, dict) and not _is_empty(partial.get(field))]
+        if not values:
+            merged[field] = [] if description.startswith("List") else ""
+        elif any(isinstance(value, list) for value in values):
+            seen, items = set(), []
+            for value in values:
+                for item in value if isinstance(value, list) else [value]:
+                    if str(item).casefold() not in seen:
+                        seen.add(str(item).casefold())
+                        items.append(item)
+            merged[field] = items
+        elif all(isinstance(value, dict) for value in values):
+            merged[field] = {key: item for value in values for key, item in value.items()}
+        elif rules.get(field) == "most_senior":
+            merged[field] = _most_senior(values)
+        elif rules.get(field) == "join":
+            merged[field] = "; ".join(dict.fromkeys(str(value).strip() for value in values))
+        else:
+            merged[field] = values[0]
+    return merged
+
 
 # -----------------------------------
 # Global Storage for Resume Data
 # -----------------------------------
-resume_storage: Dict[str, Dict[str, Any]] = {}
-user_sessions: Dict[str, str] = {}
+# Records are kept in insertion order and evicted oldest first once there are
+# more than MAX_STORED_RESUMES or they are older than RESUME_TTL_SECONDS
+MAX_STORED_RESUMES = int(os.getenv("MAX_STORED_RESUMES", "500"))
+RESUME_TTL_SECONDS = float(os.getenv("RESUME_TTL_SECONDS", str(24 * 3600)))
 
-def store_resume_data(resume_text: str, parsed_resume: Dict, original_filename: str = "") -> str:
+resume_storage: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+resume_storage_lock = threading.Lock()
+user_sessions: Dict[str, str] = {}
+_eviction_listeners = []
+
+def add_eviction_listener(callback) -> None:
+    """Call callback(resume_id) whenever a stored resume is evicted"""
+    _eviction_listeners.append(callback)
+
+def evict_resume_data() -> None:
+    """Evict expired records and the oldest ones over MAX_STORED_RESUMES"""
+    cutoff = time.monotonic() - RESUME_TTL_SECONDS
+    evicted = []
+    with resume_storage_lock:
+        while resume_storage:
+            resume_id, record = next(iter(resume_storage.items()))
+            if len(resume_storage) <= MAX_STORED_RESUMES and record["stored_at"] >= cutoff:
+                break
+            del resume_storage[resume_id]
+            evicted.append(resume_id)
+    for resume_id in evicted:
+        for callback in _eviction_listeners:
+            callback(resume_id)
+
+def store_resume_data(resume_text: str, parsed_resume: Dict, original_filename: str = "",
+                      sections: Dict[str, str] = None) -> str:
     """Store resume data and return a unique resume_id"""
     resume_id = str(uuid.uuid4())
     
-    resume_storage[resume_id] = {
+    record = {
         "original_text": resume_text,
         "parsed_data": parsed_resume,
         "filename": original_filename,
         "timestamp": datetime.datetime.now().isoformat(),
-        "personal_info": extract_personal_info_from_text(resume_text)
+        "stored_at": time.monotonic(),
+        "personal_info": extract_personal_info_from_text(resume_text),
+        "sections": sections if sections is not None else segment_resume_sections(resume_text)
     }
+    with resume_storage_lock:
+        resume_storage[resume_id] = record
+    evict_resume_data()
     
     return resume_id
 
 def get_stored_resume_data(resume_id: str) -> Dict[str, Any]:
     """Retrieve stored resume data by ID"""
-    return resume_storage.get(resume_id, {})
+    record = resume_storage.get(resume_id, {})
+    if record and record["stored_at"] < time.monotonic() - RESUME_TTL_SECONDS:
+        evict_resume_data()
+        return {}
+    return record
+
+def get_resume_sections(resume_id: str) -> Dict[str, str]:
+    """Return the cached section segments of a stored resume, segmenting on first use"""
+    record = resume_storage.get(resume_id)
+    if not record:
+        return {}
+    metrics.record_cache("resume_sections", "sections" in record)
+    if "sections" not in record:
+        record["sections"] = segment_resume_sections(record.get("original_text", ""))
+    return record["sections"]
+
+def store_analysis(resume_id: str, analysis: Dict[str, Any]) -> None:
+    """Keep the latest job description analysis of a stored resume for re-analysis"""
+    record = resume_storage.get(resume_id)
+    if record is not None:
+        record["analysis"] = analysis
+
+# -----------------------------------
+# Incremental Analysis
+# -----------------------------------
+# Parsed job descriptions by normalized-text hash, shared by every resume
+JOB_CACHE_MAX_ENTRIES = 256
+job_description_cache: "OrderedDict[str, Dict]" = OrderedDict()
+job_description_cache_lock = threading.Lock()
+
+def normalize_job_description(text: str) -> str:
+    """Collapse whitespace so edits that only re-indent or re-wrap the text count as unchanged"""
+    return " ".join((text or "").split())
+
+def job_description_key(text: str) -> str:
+    return hashlib.sha256(normalize_job_description(text).encode("utf-8")).hexdigest()
+
+def get_cached_job_description(key: str):
+    """Return the parsed job description for a key, or None"""
+    with job_description_cache_lock:
+        parsed = job_description_cache.get(key)
+        if parsed is not None:
+            job_description_cache.move_to_end(key)
+    metrics.record_cache("job_description", parsed is not None)
+    return parsed
+
+def cache_job_description(key: str, parsed: Dict) -> None:
+    with job_description_cache_lock:
+        job_description_cache[key] = parsed
+        job_description_cache.move_to_end(key)
+        while len(job_description_cache) > JOB_CACHE_MAX_ENTRIES:
+            job_description_cache.popitem(last=False)
+
+def stage_input_key(stage: str, resume: Dict, jobdes: Dict, sections: Dict[str, str] = None) -> str:
+    """Hash of exactly what a stage puts in its prompt, to tell whether it has to run again"""
+    if stage == "visualize_data":
+        inputs = [select_resume_fields(resume, stage), select_job_fields(jobdes, stage),
+                  {name: len(body) for name, body in (sections or {}).items()}]
+    else:
+        inputs = [select_resume_fields(resume, stage), jobdes]
+    encoded = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def changed_job_fields(old: Dict, new: Dict) -> list:
+    """Parsed job description fields whose values differ between two analyses"""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return sorted(set(old or {}) | set(new or {}))
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
 
 # -----------------------------------
 # Utility Functions
@@ -0,0 +1,342 @@
+"""
+Fetch job postings given as a URL and reduce them to their main text.
+A job description that is (almost) only a link used to reach the model as
+"please visit the link", which it cannot do. Such links are now fetched
+through one pooled requests.Session with per-host concurrency limits and
+timeouts; the HTML is reduced to the posting text with the stdlib parser.
+Pages are cached and revalidated with ETag / Last-Modified, so a popular
+posting is downloaded once and then costs a 304.
+Only http(s) URLs whose host resolves to public addresses are fetched, and
+every redirect hop is checked the same way, so a pasted link cannot make the
+server read internal services. The connection goes to the address that was
+checked, so a second DNS answer cannot point it elsewhere.
+"""
+import os
+import re
+import time
+import socket
+import codecs
+import ipaddress
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import single_flight
+
+FETCH_TIMEOUT = (3.05, float(os.getenv("JOB_FETCH_TIMEOUT_SECONDS", "10")))  # (connect, read)
+MAX_PER_HOST = int(os.getenv("JOB_FETCH_MAX_PER_HOST", "2"))
+# Pages younger than this are served from the cache without revalidating
+FRESH_SECONDS = float(os.getenv("JOB_PAGE_FRESH_SECONDS", "60"))
+MAX_PAGE_BYTES = 2_000_000
+MAX_TEXT_CHARS = 20_000
+CACHE_MAX_ENTRIES = 256
+# A job description with more words than this besides the link is used as pasted
+MAX_EXTRA_WORDS = 30
+MAX_REDIRECTS = 5
+# Content types reduced to text; anything else (PDFs, images, ...) is not used
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TYPES = HTML_TYPES + ("text/plain",)
+# Only for local testing (benchmarks/fake_job_board.py): also fetch private and loopback hosts
+ALLOW_PRIVATE_HOSTS = os.getenv("JOB_FETCH_ALLOW_PRIVATE_HOSTS", "").lower() in ("1", "true", "yes")
+
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+META_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.I)
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """
+    Connects to the address check_url() approved (request.pinned_address) instead
+    of resolving the host again, keeping the hostname for the Host header, SNI
+    and certificate checks.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        address = getattr(request, "pinned_address", None)
+        if address:
+            if host_params["scheme"] == "https":
+                pool_kwargs["server_hostname"] = host_params["host"]
+                pool_kwargs["assert_hostname"] = host_params["host"]
+            host_params["host"] = address
+        return host_params, pool_kwargs
+
+    def send(self, request, **kwargs):
+        if getattr(request, "pinned_address", None):
+            request.headers["Host"] = urlsplit(request.url).netloc.rsplit("@", 1)[-1]
+        return super().send(request, **kwargs)
+
+
+_session = requests.Session()
+_adapter = PinnedAddressAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+_session.headers["User-Agent"] = "Mozilla/5.0 (compatible; ResumeJobInsight/1.0)"
+
+_lock = threading.Lock()
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+# url -> {"text", "etag", "last_modified", "fetched_at"}
+_pages: "OrderedDict[str, Dict]" = OrderedDict()
+_page_flight = single_flight.SingleFlight("job_page")
+
+
+# -----------------------------------
+# HTML to Text
+# -----------------------------------
+SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "aside",
+             "form", "iframe", "template", "button", "select", "head"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "br", "tr", "table",
+              "h1", "h2", "h3", "h4", "h5", "h6", "dd", "dt", "pre", "blockquote", "title"}
+VOID_TAGS = {"br", "img", "input", "meta", "link", "hr", "source", "wbr", "area", "base", "col"}
+MAIN_HINT_PATTERN = re.compile(r"job[-_ ]?desc|description|posting|job[-_ ]?details|main[-_ ]?content", re.I)
+
+
+class MainContentParser(HTMLParser):
+    """Collect page text, separately for the main content region if the page marks one"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []  # (tag, skipped, main)
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.title = []
+        self.all_parts = []
+        self.main_parts = []
+
+    def _is_main(self, tag, attrs) -> bool:
+        if tag in ("main", "article"):
+            return True
+        attrs = dict(attrs)
+        if attrs.get("role") == "main":
+            return True
+        return bool(MAIN_HINT_PATTERN.search(f"{attrs.get('id') or ''} {attrs.get('class') or ''}"))
+
+    def _newline(self):
+        for parts in (self.all_parts, self.main_parts):
+            if parts and parts[-1] != "\n":
+                parts.append("\n")
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._newline()
+        if tag in VOID_TAGS:
+            return
+        skipped = tag in SKIP_TAGS
+        main = not self.skip_depth and self._is_main(tag, attrs)
+        self.stack.append((tag, skipped, main))
+        self.skip_depth += skipped
+        self.main_depth += main
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._newline()
+        if not any(open_tag == tag for open_tag, _, _ in self.stack):
+            return
+        # Pop up to the matching tag, closing anything left open inside it
+        while self.stack:
+            open_tag, skipped, main = self.stack.pop()
+            self.skip_depth -= skipped
+            self.main_depth -= main
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        # <title> is kept even though the <head> around it is skipped
+        if self.stack and self.stack[-1][0] == "title":
+            self.title.append(data)
+            return
+        if self.skip_depth:
+            return
+        text = " ".join(data.split())
+        if not text:
+            return
+        self.all_parts.append(text)
+        if self.main_depth:
+            self.main_parts.append(text)
+
+
+def _join(parts) -> str:
+    lines = " ".join(parts).split("\n")
+    return "\n".join(line.strip() for line in lines if line.strip())
+
+
+def extract_main_text(html: str) -> str:
+    """Visible text of the main content of an HTML page (whole body if none is marked)"""
+    parser = MainContentParser()
+    parser.feed(html)
+    parser.close()
+    main_text = _join(parser.main_parts)
+    text = main_text if len(main_text) >= 200 else _join(parser.all_parts)
+    title = " ".join(" ".join(parser.title).split())
+    if title and not text.startswith(title):
+        text = f"{title}\n{text}"
+    return text[:MAX_TEXT_CHARS]
+
+
+# -----------------------------------
+# Fetching
+# -----------------------------------
+class UnsafeURL(ValueError):
+    """A URL that is not http(s) or points at a non-public address"""
+
+
+def check_url(url: str) -> Optional[str]:
+    """
+    Raise UnsafeURL unless the URL is http(s) and its host resolves only to public
+    addresses. Returns the address to connect to (None when private hosts are allowed).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeURL(f"not an http(s) URL: {url}")
+    if ALLOW_PRIVATE_HOSTS:
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = [info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)]
+    except (socket.gaierror, ValueError) as e:
+        raise UnsafeURL(f"cannot resolve {parts.hostname}: {e}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified or not ip.is_global):
+            raise UnsafeURL(f"{parts.hostname} resolves to non-public address {ip}")
+    return addresses[0]
+
+
+def _decode(response, body: bytes) -> str:
+    """Decode a page: header charset, then <meta> charset, then UTF-8 if valid, then the HTTP default"""
+    if "charset=" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        return body.decode(response.encoding, errors="replace")
+    match = META_CHARSET_PATTERN.search(body[:4096])
+    if match:
+        try:
+            return body.decode(codecs.lookup(match.group(1).decode("ascii")).name, errors="replace")
+        except LookupError:
+            pass
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        return body.decode(response.encoding or "iso-8859-1", errors="replace")
+
+
+@contextmanager
+def _get(url: str, headers: Dict):
+    """
+    GET a checked URL, following redirects only to URLs that pass check_url as well.
+    Each hop holds its own host's limit; the final one until the body has been read.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        request = _session.prepare_request(requests.Request("GET", url, headers=headers))
+        request.pinned_address = check_url(url)
+        with _host_limit(url):
+            response = _session.send(request, timeout=FETCH_TIMEOUT, stream=True, allow_redirects=False)
+            if not response.is_redirect:
+                with response:
+                    yield response
+                return
+            response.close()
+        url = urljoin(url, response.headers["Location"])
+    raise UnsafeURL(f"more than {MAX_REDIRECTS} redirects")
+
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc.lower()
+    with _lock:
+        limit = _host_limits.get(host)
+        if limit is None:
+            limit = _host_limits[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+    return limit
+
+
+def _cache_page(url: str, page: Dict) -> None:
+    with _lock:
+        _pages[url] = page
+        _pages.move_to_end(url)
+        while len(_pages) > CACHE_MAX_ENTRIES:
+            _pages.popitem(last=False)
+
+
+def fetch_page_text(url: str) -> str:
+    """Main text of a page, from the cache when it is fresh or still valid (304)"""
+    # Concurrent requests for one posting share a single download
+    return _page_flight.do(url, lambda: _fetch_page_text(url))
+
+
+def _fetch_page_text(url: str) -> str:
+    with _lock:
+        cached = _pages.get(url)
+    if cached and time.monotonic() - cached["fetched_at"] < FRESH_SECONDS:
+        metrics.record_cache("job_page", True)
+        return cached["text"]
+
+    headers = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    with metrics.track_stage("job_fetch"), _get(url, headers) as response:
+        if response.status_code == 304:
+            if not cached:
+                # Nothing to revalidate: a 304 here is not a page
+                metrics.record_cache("job_page", False)
+                raise ValueError("304 Not Modified without a cached copy")
+            metrics.record_cache("job_page", True)
+            _cache_page(url, dict(cached, fetched_at=time.monotonic()))
+            return cached["text"]
+        response.raise_for_status()
+
+        content_type = response.headers.get("Content-Type", "text/html").split(";")[0].strip().lower()
+        if content_type not in TEXT_TYPES:
+            raise ValueError(f"not a web page: {content_type}")
+
+        body, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            body.append(chunk)
+            size += len(chunk)
+            if size >= MAX_PAGE_BYTES:
+                break
+        content = _decode(response, b"".join(body))
+        is_html = content_type in HTML_TYPES
+
+    metrics.record_cache("job_page", False)
+    text = extract_main_text(content) if is_html else content[:MAX_TEXT_CHARS]
+    _cache_page(url, {
+        "text": text,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": time.monotonic(),
+    })
+    return text
+
+
+def resolve_job_description(text: str) -> Tuple[str, Optional[str]]:
+    """
+    Return (job description text, source URL). A job description that is just a
+    link (plus a few words) is replaced by the fetched posting; anything else,
+    or a failed fetch, is returned unchanged with no source URL.
+    """
+    urls = URL_PATTERN.findall(text or "")
+    if not urls or len(URL_PATTERN.sub(" ", text).split()) > MAX_EXTRA_WORDS:
+        return text, None
+
+    url = urls[0].rstrip(").,;'\"")
+    if not url.startswith("http"):
+        url = f"https://{url}"
+    try:
+        page_text = fetch_page_text(url)
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Could not fetch job posting {url}: {e}")
+        metrics.inc("job_fetch_errors_total", error=type(e).__name__)
+        return text, None
+    if not page_text.strip():
+        return text, None
+
+    print(f"🌐 Fetched job posting {url} ({len(page_text)} chars)")
+    extra = URL_PATTERN.sub(" ", text).strip()
+    return (f"{extra}\n\n{page_text}" if extra else page_text), url
@@ -0,0 +1,122 @@
+"""
+Pool of Google API keys.
+Keys come from GOOGLE_API_KEYS (comma separated), falling back to the single
+GOOGLE_API_KEY. Requests and tokens are tracked per (key, model) over the
+last minute against that model's per-key RPM/TPM limits. Each call goes to
+the key with the most headroom, and a key that hits a quota error is
+quarantined for that model for a while, so throughput grows with the
+number of keys.
+
+Limits default to the Gemini free tier; override them with API_KEY_LIMITS,
+a JSON object such as '{"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}}'.
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import metrics
+
+WINDOW_SECONDS = 60.0
+QUARANTINE_SECONDS = float(os.getenv("API_KEY_QUARANTINE_SECONDS", "60"))
+
+DEFAULT_LIMITS = {
+    "default": {"rpm": 10, "tpm": 250_000},
+    "gemini-2.5-pro": {"rpm": 5, "tpm": 250_000},
+    "gemini-2.5-flash": {"rpm": 10, "tpm": 250_000},
+    "gemini-2.0-flash": {"rpm": 15, "tpm": 1_000_000},
+}
+
+
+def load_keys() -> List[Optional[str]]:
+    keys = [key.strip() for key in os.getenv("GOOGLE_API_KEYS", "").split(",") if key.strip()]
+    if not keys and os.getenv("GOOGLE_API_KEY"):
+        keys = [os.environ["GOOGLE_API_KEY"]]
+    # None: let the client find its key the usual way
+    return keys or [None]
+
+
+def load_limits() -> Dict[str, Dict[str, float]]:
+    limits = json.loads(json.dumps(DEFAULT_LIMITS))
+    for model_name, model_limits in json.loads(os.getenv("API_KEY_LIMITS", "{}")).items():
+        limits.setdefault(model_name, dict(limits["default"])).update(model_limits)
+    return limits
+
+
+class KeyPool:
+    def __init__(self, keys: List[Optional[str]], limits: Dict[str, Dict[str, float]]):
+        self.keys = keys
+        self.limits = limits
+        self.lock = threading.Lock()
+        # (key index, model) -> deque of (time, tokens)
+        self.usage: Dict[tuple, deque] = {}
+        self.quarantined_until: Dict[tuple, float] = {}
+        self.last_used: Dict[tuple, float] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def label(index: int) -> str:
+        """Metric label for a key (never the key itself)"""
+        return f"key{index}"
+
+    def _window(self, index: int, model_name: str, now: float) -> deque:
+        window = self.usage.setdefault((index, model_name), deque())
+        while window and window[0][0] < now - WINDOW_SECONDS:
+            window.popleft()
+        return window
+
+    def _headroom(self, index: int, model_name: str, now: float) -> float:
+        limits = self.limits.get(model_name, self.limits["default"])
+        window = self._window(index, model_name, now)
+        used_tokens = sum(tokens for _, tokens in window)
+        return min(1 - len(window) / limits["rpm"], 1 - used_tokens / limits["tpm"])
+
+    def acquire(self, model_name: str, tokens: int, exclude: Iterable[int] = ()) -> int:
+        """Pick the key index with the most headroom for a call and count the call against it"""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [index for index in range(self.size) if index not in exclude] or list(range(self.size))
+            healthy = [index for index in candidates
+                       if self.quarantined_until.get((index, model_name), 0) <= now]
+            if healthy:
+                index = max(healthy, key=lambda i: (self._headroom(i, model_name, now),
+                                                    -self.last_used.get((i, model_name), 0)))
+            else:
+                # Every key is quarantined: use the one that recovers first
+                index = min(candidates, key=lambda i: self.quarantined_until[(i, model_name)])
+            self._window(index, model_name, now).append((now, tokens))
+            self.last_used[(index, model_name)] = now
+            headroom = self._headroom(index, model_name, now)
+        metrics.inc("api_key_requests_total", key=self.label(index), model=model_name)
+        metrics.set_gauge("api_key_headroom", round(headroom, 3), key=self.label(index), model=model_name)
+        return index
+
+    def add_tokens(self, index: int, model_name: str, tokens: int) -> None:
+        """Count output tokens of a finished call against its key"""
+        with self.lock:
+            self.usage.setdefault((index, model_name), deque()).append((time.monotonic(), tokens))
+
+    def quarantine(self, index: int, model_name: str) -> None:
+        """Take a key out of rotation for a model after a quota error"""
+        with self.lock:
+            self.quarantined_until[(index, model_name)] = time.monotonic() + QUARANTINE_SECONDS
+        print(f"🔑 {self.label(index)} hit its {model_name} quota - quarantined for {QUARANTINE_SECONDS:g}s")
+        metrics.inc("api_key_quarantines_total", key=self.label(index), model=model_name)
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        with self.lock:
+            return {
+                "keys": self.size,
+                "quarantined": sorted(f"{self.label(index)}:{model_name}"
+                                      for (index, model_name), until in self.quarantined_until.items()
+                                      if until > now),
+            }
+
+
+pool = KeyPool(load_keys(), load_limits())
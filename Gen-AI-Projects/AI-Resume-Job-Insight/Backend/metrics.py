@@ -0,0 +1,228 @@
+"""
+In-process metrics for the Resume Processing API, rendered in the Prometheus
+text exposition format by the /metrics endpoint.
+Everything is kept in plain dicts behind one lock, so recording a sample costs
+a few dictionary updates.
+"""
+import math
+import time
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage latencies range from milliseconds (PDF extraction) to a minute (LLM calls)
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+
+# Recent latency samples kept per (stage, model) for quantile estimates
+RECENT_SAMPLES = 200
+
+METRICS = {
+    "resume_stage_duration_seconds": ("histogram", "Latency of each pipeline stage"),
+    "resume_pipeline_duration_seconds": ("histogram", "Latency of a full /api/process-resume request"),
+    "resume_requests_total": ("counter", "Processed /api/process-resume requests by result"),
+    "llm_input_tokens_total": ("counter", "Estimated prompt tokens sent to the model (chars / 4)"),
+    "llm_output_tokens_total": ("counter", "Estimated completion tokens returned by the model (chars / 4)"),
+    "llm_errors_total": ("counter", "LLM call failures by error_type"),
+    "llm_retries_total": ("counter", "LLM calls retried by the server"),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss)"),
+    "cache_hit_ratio": ("gauge", "Cache hits divided by lookups since start"),
+    "admission_in_flight": ("gauge", "Analyses currently running"),
+    "admission_queue_depth": ("gauge", "Analyses waiting for a slot"),
+    "admission_rejected_total": ("counter", "Analyses rejected with 429 by reason"),
+    "model_routing_total": ("counter", "Automatic model routing decisions by stage and model"),
+    "llm_hedges_total": ("counter", "Hedged LLM calls by stage and result (primary_won/backup_won/over_budget)"),
+    "stage_reuse_total": ("counter", "LLM stages skipped because their inputs were unchanged or the result was derived locally"),
+    "pdf_prerenders_total": ("counter", "Background resume PDF renders by result (scheduled/cancelled/expired)"),
+    "job_fetch_errors_total": ("counter", "Job posting URLs that could not be fetched, by error"),
+    "single_flight_calls_total": ("counter", "LLM calls by role: leader (sent upstream) or merged into an identical in-flight call"),
+    "api_key_requests_total": ("counter", "LLM calls sent with each pooled API key, by key and model"),
+    "api_key_headroom": ("gauge", "Share of a key's per-minute request/token budget left after its last call"),
+    "api_key_quarantines_total": ("counter", "API keys taken out of rotation after a quota error, by key and model"),
+    "checkpoint_requests_total": ("counter", "Requests with an idempotency key by result (new/resumed/replayed)"),
+}
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, LabelSet], float] = defaultdict(float)
+_gauges: Dict[Tuple[str, LabelSet], float] = {}
+_histograms: Dict[Tuple[str, LabelSet], list] = {}
+_recent: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+_outcomes: Dict[str, deque] = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+
+
+def _labels(labels: Dict[str, str]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+# -----------------------------------
+# Recording
+# -----------------------------------
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Increment a counter"""
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] += amount
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set a gauge to an absolute value"""
+    with _lock:
+        _gauges[(name, _labels(labels))] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Add a sample to a histogram"""
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # [per-bucket counts..., +Inf count, sum]
+            histogram = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(LATENCY_BUCKETS)] += 1
+        histogram[-1] += value
+
+
+def estimate_tokens(prompt) -> int:
+    """Rough token estimate (4 characters per token) for a string, PromptValue or message list"""
+    if prompt is None:
+        return 0
+    if isinstance(prompt, str):
+        return len(prompt) // 4
+    if isinstance(prompt, (list, tuple)):
+        return sum(len(str(getattr(message, "content", message))) for message in prompt) // 4
+    if hasattr(prompt, "to_string"):
+        return len(prompt.to_string()) // 4
+    return len(str(prompt)) // 4
+
+
+def record_tokens(stage: str, model: str, prompt, output) -> None:
+    inc("llm_input_tokens_total", estimate_tokens(prompt), stage=stage, model=model)
+    inc("llm_output_tokens_total", estimate_tokens(output), stage=stage, model=model)
+
+
+def record_error(error_type: str, stage: str, model: str) -> None:
+    inc("llm_errors_total", error_type=error_type, stage=stage, model=model)
+
+
+def record_outcome(model: str, ok: bool) -> None:
+    """Remember whether a model call succeeded, for recent_error_rate()"""
+    with _lock:
+        _outcomes[model].append(ok)
+
+
+def record_retry(stage: str, model: str, reason: str) -> None:
+    inc("llm_retries_total", stage=stage, model=model, reason=reason)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def track_stage(stage: str, model: str = "none"):
+    """Time a pipeline stage into resume_stage_duration_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("resume_stage_duration_seconds", elapsed, stage=stage, model=model)
+        with _lock:
+            _recent[(stage, model)].append(elapsed)
+
+
+# -----------------------------------
+# Reading
+# -----------------------------------
+def recent_latency_quantile(stage: str, model: str, quantile: float, default: float = None):
+    """Quantile of the recent latencies of a stage/model, or default if there are no samples"""
+    with _lock:
+        samples = sorted(_recent.get((stage, model), ()))
+    if not samples:
+        return default
+    index = min(len(samples) - 1, max(0, math.ceil(quantile * len(samples)) - 1))
+    return samples[index]
+
+
+def recent_sample_count(stage: str, model: str) -> int:
+    with _lock:
+        return len(_recent.get((stage, model), ()))
+
+
+def recent_error_rate(model: str) -> Tuple[float, int]:
+    """(failed share, sample count) of the recent calls to a model"""
+    with _lock:
+        outcomes = list(_outcomes.get(model, ()))
+    if not outcomes:
+        return 0.0, 0
+    return outcomes.count(False) / len(outcomes), len(outcomes)
+
+
+def counter_value(name: str, **labels) -> float:
+    """Sum of a counter over every label set that contains the given labels"""
+    wanted = set(_labels(labels))
+    with _lock:
+        return sum(value for (metric, label_set), value in _counters.items()
+                   if metric == name and wanted <= set(label_set))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_set: LabelSet, extra: LabelSet = ()) -> str:
+    pairs = label_set + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+
+    # Derived hit ratio per cache
+    lookups: Dict[str, list] = defaultdict(lambda: [0.0, 0.0])
+    for (name, label_set), value in counters.items():
+        if name == "cache_requests_total":
+            labels = dict(label_set)
+            lookups[labels["cache"]][0 if labels["result"] == "hit" else 1] += value
+    for cache, (hits, misses) in lookups.items():
+        gauges[("cache_hit_ratio", (("cache", cache),))] = hits / (hits + misses)
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "histogram":
+            for (metric, label_set), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(label_set, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(label_set)} {_format_value(histogram[-1])}")
+                lines.append(f"{name}_count{_format_labels(label_set)} {cumulative}")
+        else:
+            source = counters if metric_type == "counter" else gauges
+            for (metric, label_set), value in sorted(source.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(label_set)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,88 @@
+"""
+Per-stage model routing for selectedServer=auto.
+Each stage has a default model and, optionally, a heavier model for large
+inputs. A model whose recent error rate or p90 latency is over the policy
+limits is skipped in favour of the next candidate.
+
+The policy can be overridden with MODEL_ROUTING_POLICY, either inline JSON or
+a path to a JSON file; keys that are not given keep their defaults.
+"""
+import os
+import json
+from typing import Dict, Tuple
+
+import metrics
+
+AUTO = "auto"
+
+DEFAULT_POLICY = {
+    # Fallback order when a stage's preferred model is unhealthy
+    "candidates": ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.5-pro"],
+    "stages": {
+        "parse_resume": {"default": "gemini-2.5-flash"},
+        "parse_job_description": {"default": "gemini-2.0-flash"},
+        "comparing": {"default": "gemini-2.5-flash", "large": "gemini-2.5-pro", "large_input_tokens": 2500},
+        "visualize_data": {"default": "gemini-2.0-flash"},
+    },
+    # A model is skipped when its recent error rate or p90 stage latency is above these
+    "max_error_rate": 0.25,
+    "max_p90_seconds": 40,
+    # Outcomes needed before the error rate is trusted
+    "min_samples": 5,
+}
+
+
+def load_policy() -> Dict:
+    policy = json.loads(json.dumps(DEFAULT_POLICY))
+    override = os.getenv("MODEL_ROUTING_POLICY", "").strip()
+    if not override:
+        return policy
+    if not override.startswith("{"):
+        with open(override) as f:
+            override = f.read()
+    custom = json.loads(override)
+    for stage, rules in custom.pop("stages", {}).items():
+        policy["stages"].setdefault(stage, {}).update(rules)
+    policy.update(custom)
+    return policy
+
+
+policy = load_policy()
+
+
+def model_health(stage: str, model_name: str) -> Tuple[bool, str]:
+    """Return (healthy, reason) from recent error rate and latency of a model"""
+    error_rate, samples = metrics.recent_error_rate(model_name)
+    if samples >= policy["min_samples"] and error_rate > policy["max_error_rate"]:
+        return False, f"error rate {error_rate:.0%}"
+    p90 = metrics.recent_latency_quantile(stage, model_name, 0.9)
+    if p90 is not None and p90 > policy["max_p90_seconds"]:
+        return False, f"p90 {p90:.1f}s"
+    return True, "healthy"
+
+
+def choose_model(stage: str, input_tokens: int) -> Dict:
+    """Pick a model for one stage call; returns the routing decision"""
+    rules = policy["stages"].get(stage, {})
+    preferred = rules.get("default", policy["candidates"][0])
+    reason = "stage default"
+    if "large" in rules and input_tokens >= rules.get("large_input_tokens", 0):
+        preferred = rules["large"]
+        reason = f"input >= {rules['large_input_tokens']} tokens"
+
+    skipped = {}
+    for model_name in [preferred] + [name for name in policy["candidates"] if name != preferred]:
+        healthy, health_reason = model_health(stage, model_name)
+        if healthy:
+            break
+        skipped[model_name] = health_reason
+    else:
+        # Everything looks unhealthy - stay with the preferred model
+        model_name = preferred
+        reason = "all candidates unhealthy"
+
+    if model_name != preferred:
+        reason = f"{preferred} skipped ({skipped[preferred]})"
+
+    metrics.inc("model_routing_total", stage=stage, model=model_name)
+    return {"model": model_name, "reason": reason, "input_tokens": input_tokens, "skipped": skipped}
@@ -0,0 +1,110 @@
+"""
+Speculative background rendering of the resume PDF.
+Once an analysis has been sent, the PDF for its stored parsed_data is
+rendered on a small low-priority pool and cached under the resume_id, so the
+download click in /api/generate-resume is a cache lookup. Pre-renders are
+dropped (or cancelled if still queued) when their resume record is evicted,
+and expire if nobody asks for them within PRERENDER_TTL_SECONDS.
+"""
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import helper_function
+import metrics
+
+PRERENDER_WORKERS = int(os.getenv("PRERENDER_WORKERS", "1"))
+PRERENDER_TTL_SECONDS = float(os.getenv("PRERENDER_TTL_SECONDS", "1800"))
+# Niceness added to pre-render threads so they yield the CPU to request handling
+PRERENDER_NICENESS = 10
+
+
+def _lower_priority():
+    try:
+        # On Linux the thread id is a valid target for setpriority
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PRERENDER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+_executor = ThreadPoolExecutor(max_workers=PRERENDER_WORKERS, thread_name_prefix="prerender",
+                               initializer=_lower_priority)
+_lock = threading.Lock()
+# resume_id -> (future of (success, pdf_base64 or error), time scheduled)
+_renders: Dict[str, Tuple[Future, float]] = {}
+
+
+def pdf_file_name(parsed_data: Dict) -> str:
+    name = parsed_data.get("Name") if isinstance(parsed_data, dict) else None
+    return f"{name or 'resume'}.pdf"
+
+
+def render(parsed_data: Dict) -> Tuple[bool, str]:
+    """Render the resume PDF for parsed data; returns (success, pdf_base64 or error)"""
+    with metrics.track_stage("pdf_render"):
+        return helper_function.create_resume_pdf(parsed_data, file_name=pdf_file_name(parsed_data))
+
+
+def schedule(resume_id: str) -> None:
+    """Queue a pre-render of a stored resume (no-op if already queued or evicted)"""
+    expire()
+    parsed_data = helper_function.get_stored_resume_data(resume_id).get("parsed_data")
+    if not isinstance(parsed_data, dict):
+        return
+    with _lock:
+        if resume_id in _renders:
+            return
+        _renders[resume_id] = (_executor.submit(render, parsed_data), time.monotonic())
+    metrics.inc("pdf_prerenders_total", result="scheduled")
+
+
+def get(resume_id: str, timeout: Optional[float] = None) -> Optional[Tuple[bool, str]]:
+    """
+    Pre-rendered (success, pdf_base64 or error), waiting for a running render.
+    None if there is none, or if it is still queued: it is then cancelled so the
+    caller renders inline instead of waiting behind other pre-renders.
+    """
+    with _lock:
+        entry = _renders.get(resume_id)
+    if entry is not None and entry[0].cancel():
+        with _lock:
+            if _renders.get(resume_id) is entry:
+                del _renders[resume_id]
+        metrics.inc("pdf_prerenders_total", result="cancelled")
+    if entry is None or entry[0].cancelled():
+        metrics.record_cache("resume_pdf", False)
+        return None
+    metrics.record_cache("resume_pdf", True)
+    return entry[0].result(timeout=timeout)
+
+
+def put(resume_id: str, result: Tuple[bool, str]) -> None:
+    """Cache a PDF rendered on demand"""
+    future = Future()
+    future.set_result(result)
+    with _lock:
+        _renders[resume_id] = (future, time.monotonic())
+
+
+def discard(resume_id: str) -> None:
+    """Drop a pre-render, cancelling it if it has not started"""
+    with _lock:
+        entry = _renders.pop(resume_id, None)
+    if entry is not None and entry[0].cancel():
+        metrics.inc("pdf_prerenders_total", result="cancelled")
+
+
+def expire() -> None:
+    """Drop pre-renders older than PRERENDER_TTL_SECONDS"""
+    cutoff = time.monotonic() - PRERENDER_TTL_SECONDS
+    with _lock:
+        stale = [resume_id for resume_id, (_, created) in _renders.items() if created < cutoff]
+    for resume_id in stale:
+        discard(resume_id)
+        metrics.inc("pdf_prerenders_total", result="expired")
+
+
+# Evicted resume records take their PDFs with them
+helper_function.add_eviction_listener(discard)
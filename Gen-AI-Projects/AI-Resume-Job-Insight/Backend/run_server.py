@@ -1,89 +1,296 @@
 #!/usr/bin/env python3
 """
-Auto-restart wrapper for the Resume Processing API
-This script automatically restarts the server when it exits due to quota issues
+Supervisor for the Resume Processing API.
+
+The supervisor owns the listening socket and runs two workers on it: an
+active one serving traffic and a warm standby that has already done its
+imports and warm-up. When the active worker exits, the standby is promoted
+at once; connections that arrive meanwhile wait in the socket backlog
+instead of being refused. A graceful restart (SIGHUP, or a worker asking
+for one after a stuck Gemini call) promotes the standby first and then lets
+the old worker drain: it stops accepting, answers with Connection: close
+so keep-alive clients reconnect to the new worker, and exits once its
+in-flight requests are done. Restarts are rate limited
+with a cool-down instead of a lifetime cap.
+
+Usage: PORT=8503 python run_server.py
+Signals: SIGHUP graceful restart, SIGTERM/SIGINT graceful shutdown.
 """
-import subprocess
+import os
 import sys
 import time
-import os
+import signal
+import socket
+import threading
+import subprocess
+from collections import deque
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8503"))
+# More than MAX_RESTARTS unplanned restarts within RESTART_WINDOW_SECONDS
+# pauses new workers for COOLDOWN_SECONDS
+MAX_RESTARTS = int(os.getenv("SUPERVISOR_MAX_RESTARTS", "5"))
+RESTART_WINDOW_SECONDS = float(os.getenv("SUPERVISOR_RESTART_WINDOW_SECONDS", "60"))
+COOLDOWN_SECONDS = float(os.getenv("SUPERVISOR_COOLDOWN_SECONDS", "30"))
+# How long a retiring worker may take to finish its in-flight requests
+DRAIN_SECONDS = float(os.getenv("WORKER_DRAIN_SECONDS", "90"))
+# Keep-alive timeout of the workers; a retiring worker keeps answering (with
+# Connection: close) a little longer than this so idle client connections move over
+KEEP_ALIVE_SECONDS = 5
+
+
+# -----------------------------------
+# Worker Process
+# -----------------------------------
+def run_worker(fd: int):
+    """Warm up, wait for promotion, then serve on the inherited socket"""
+    status_fd = int(os.environ["SUPERVISOR_STATUS_FD"])
+    promoted = threading.Event()
+    drain_requested = threading.Event()
+    signal.signal(signal.SIGUSR1, lambda signum, frame: promoted.set())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: drain_requested.set())
+
+    def report(state):
+        os.write(status_fd, f"{state}\n".encode())
+
+    # Signals sent before this point would kill the process, so the supervisor waits for it
+    report("booting")
+
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+    import Server
 
-def run_server_with_auto_restart():
-    """Run the server with automatic restart capability"""
-    max_restarts = 5
-    restart_count = 0
-    
-    print("🚀 Starting Resume Processing API with Auto-Restart")
-    print("=" * 60)
-    
-    while restart_count < max_restarts:
+    Server.warm_up()
+    report("warm")
+    while not promoted.wait(0.5):
+        pass
+
+    server = uvicorn.Server(uvicorn.Config(Server.app, timeout_keep_alive=KEEP_ALIVE_SECONDS,
+                                          timeout_graceful_shutdown=DRAIN_SECONDS))
+
+    def report_serving():
+        while not server.started and not server.should_exit:
+            time.sleep(0.05)
+        if server.started:
+            report("serving")
+
+    def drain_on_request():
+        """Stop accepting, tell keep-alive clients to reconnect, then shut down gracefully"""
+        drain_requested.wait()
+        Server.draining.set()
+        for listener in server.servers:
+            listener.get_loop().call_soon_threadsafe(listener.close)
+        time.sleep(KEEP_ALIVE_SECONDS + 1)
+        # uvicorn then waits up to DRAIN_SECONDS for in-flight requests
+        server.should_exit = True
+
+    threading.Thread(target=report_serving, daemon=True).start()
+    threading.Thread(target=drain_on_request, daemon=True).start()
+    server.run(sockets=[socket.socket(fileno=fd)])
+
+
+class Worker:
+    """Supervisor-side handle of a worker process and the state it reports"""
+
+    def __init__(self, sock: socket.socket):
+        read_fd, write_fd = os.pipe()
+        env = dict(os.environ, SUPERVISOR_STATUS_FD=str(write_fd))
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(sock.fileno())],
+            cwd=BACKEND_DIR, env=env, pass_fds=(sock.fileno(), write_fd),
+            # Own session: a Ctrl-C in the terminal reaches only the supervisor
+            start_new_session=True,
+        )
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        self.status_fd = read_fd
+        self.state = "starting"
+        self.restart_requested = False
+        self.promotion_pending = False
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def promote(self) -> None:
+        """Send SIGUSR1 once the worker can handle it"""
+        self.promotion_pending = self.state == "starting"
+        if not self.promotion_pending:
+            self.signal(signal.SIGUSR1)
+
+    def read_status(self) -> None:
         try:
-            print(f"\n📡 Starting server (attempt {restart_count + 1}/{max_restarts})...")
-            
-            # Start the server process
-            process = subprocess.Popen([
-                sys.executable, "Server.py"
-            ], cwd=os.path.dirname(os.path.abspath(__file__)))
-            
-            # Wait for the process to complete
-            exit_code = process.wait()
-            
-            print(f"\n⚠️ Server exited with code: {exit_code}")
-            
+            data = os.read(self.status_fd, 4096)
+        except BlockingIOError:
+            return
+        for line in data.decode().split():
+            if line == "restart":
+                self.restart_requested = True
+            else:
+                self.state = line
+        if self.promotion_pending and self.state != "starting":
+            self.promote()
+
+    def signal(self, signum) -> None:
+        if self.process.poll() is None:
+            self.process.send_signal(signum)
+
+    def close(self) -> None:
+        os.close(self.status_fd)
+
+
+# -----------------------------------
+# Supervisor
+# -----------------------------------
+class Supervisor:
+    def __init__(self, host: str, port: int):
+        self.sock = socket.create_server((host, port), backlog=2048)
+        self.sock.set_inheritable(True)
+        self.active = None
+        self.standby = None
+        self.retiring = []  # replaced, waiting for the new active worker to serve
+        self.draining = []  # (worker, kill deadline)
+        self.restarts = deque()
+        self.cooldown_until = 0.0
+        self.reload_requested = False
+        self.stop_requested = False
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def note_restart(self) -> None:
+        """Count an unplanned restart; too many in the window starts a cool-down"""
+        now = time.monotonic()
+        self.restarts.append(now)
+        while self.restarts and self.restarts[0] < now - RESTART_WINDOW_SECONDS:
+            self.restarts.popleft()
+        if len(self.restarts) > MAX_RESTARTS:
+            self.restarts.clear()
+            self.cooldown_until = now + COOLDOWN_SECONDS
+            print(f"🧊 {MAX_RESTARTS}+ restarts in {RESTART_WINDOW_SECONDS:g}s - "
+                  f"cooling down for {COOLDOWN_SECONDS:g}s before starting workers")
+
+    def spawn(self) -> Worker:
+        worker = Worker(self.sock)
+        print(f"📡 Started worker {worker.pid}")
+        return worker
+
+    def activate(self) -> None:
+        """Promote the standby (or a fresh worker) to serve traffic"""
+        if self.standby is not None:
+            worker, self.standby = self.standby, None
+        elif self.cooling_down():
+            self.active = None
+            return
+        else:
+            worker = self.spawn()
+        worker.promote()
+        self.active = worker
+        print(f"✅ Worker {worker.pid} promoted ({worker.state})")
+
+    def retire_active(self, reason: str) -> None:
+        """Graceful restart: promote the standby, then drain the old worker once the new one serves"""
+        if self.retiring or self.active is None:
+            return
+        print(f"🔄 Graceful restart of worker {self.active.pid}: {reason}")
+        self.retiring.append(self.active)
+        self.activate()
+
+    def check_workers(self) -> None:
+        for worker in [self.active, self.standby, *self.retiring]:
+            if worker is not None:
+                worker.read_status()
+
+        if self.active is not None and self.active.restart_requested:
+            self.active.restart_requested = False
+            self.note_restart()
+            self.retire_active("requested by worker")
+
+        if self.active is not None and self.active.process.poll() is not None:
+            exit_code = self.active.process.returncode
+            print(f"⚠️ Worker {self.active.pid} exited with code: {exit_code}")
+            self.active.close()
+            self.active = None
             if exit_code == 0:
-                # Clean exit - don't restart
+                # Clean exit - shut down as the old wrapper did
                 print("✅ Server shut down cleanly")
-                break
-            elif exit_code == 42:
-                # Quota restart requested
-                restart_count += 1
-                if restart_count < max_restarts:
-                    print(f"🔄 Quota restart detected! Restarting in 5 seconds... ({restart_count}/{max_restarts})")
-                    time.sleep(5)
-                else:
-                    print("❌ Maximum quota restarts reached")
-                    break
-            elif exit_code == 1:
-                # Error exit - restart after delay
-                restart_count += 1
-                if restart_count < max_restarts:
-                    print(f"🔄 Restarting in 5 seconds... ({restart_count}/{max_restarts})")
-                    time.sleep(5)
-                else:
-                    print("❌ Maximum restart attempts reached")
-                    break
-            else:
-                # Unexpected exit code
-                print(f"❓ Unexpected exit code: {exit_code}")
-                restart_count += 1
-                if restart_count < max_restarts:
-                    print(f"🔄 Attempting restart anyway... ({restart_count}/{max_restarts})")
-                    time.sleep(3)
-                else:
-                    print("❌ Maximum restart attempts reached")
-                    break
-                
-        except KeyboardInterrupt:
-            print("\n🛑 Shutdown requested by user")
-            if 'process' in locals() and process.poll() is None:
-                print("🔄 Terminating server process...")
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-            break
-        except Exception as e:
-            print(f"❌ Error running server: {e}")
-            restart_count += 1
-            if restart_count < max_restarts:
-                print(f"🔄 Retrying in 5 seconds... ({restart_count}/{max_restarts})")
-                time.sleep(5)
-            else:
-                print("❌ Maximum restart attempts reached")
-                break
-    
-    print("\n👋 Auto-restart wrapper shutting down")
+                self.stop_requested = True
+                return
+            self.note_restart()
+            self.activate()
+
+        if self.standby is not None and self.standby.process.poll() is not None:
+            print(f"⚠️ Standby worker {self.standby.pid} exited with code: {self.standby.process.returncode}")
+            self.standby.close()
+            self.standby = None
+            self.note_restart()
+
+        if self.active is not None and self.active.state == "serving":
+            for worker in self.retiring:
+                # SIGUSR2: stop accepting and drain; the worker exits by itself
+                worker.signal(signal.SIGUSR2)
+                self.draining.append((worker, time.monotonic() + KEEP_ALIVE_SECONDS + DRAIN_SECONDS + 10))
+            self.retiring = []
+
+        for worker, deadline in list(self.draining):
+            if worker.process.poll() is not None:
+                print(f"👋 Worker {worker.pid} drained and exited")
+                worker.close()
+                self.draining.remove((worker, deadline))
+            elif time.monotonic() > deadline:
+                worker.signal(signal.SIGKILL)
+
+        if not self.cooling_down():
+            if self.active is None:
+                self.activate()
+            if self.standby is None:
+                self.standby = self.spawn()
+
+    def shutdown(self) -> None:
+        print("🛑 Shutting down: draining workers...")
+        workers = [worker for worker in [self.standby, self.active, *self.retiring] if worker is not None]
+        workers += [worker for worker, _ in self.draining]
+        for worker in workers:
+            worker.signal(signal.SIGTERM)
+        for worker in workers:
+            try:
+                worker.process.wait(timeout=DRAIN_SECONDS + 5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+        self.sock.close()
+
+    def run(self) -> None:
+        print("🚀 Starting Resume Processing API supervisor")
+        print(f"   listening on {HOST}:{PORT}, warm standby enabled")
+        print("=" * 60)
+
+        def request_reload(signum, frame):
+            self.reload_requested = True
+
+        def request_stop(signum, frame):
+            self.stop_requested = True
+
+        signal.signal(signal.SIGHUP, request_reload)
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.standby = self.spawn()
+        self.activate()
+        self.standby = self.spawn()
+        while not self.stop_requested:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.retire_active("SIGHUP")
+            self.check_workers()
+            time.sleep(0.1)
+        self.shutdown()
+        print("\n👋 Supervisor shutting down")
+
 
 if __name__ == "__main__":
-    run_server_with_auto_restart()
\ No newline at end of file
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        run_worker(int(sys.argv[2]))
+    else:
+        Supervisor(HOST, PORT).run()
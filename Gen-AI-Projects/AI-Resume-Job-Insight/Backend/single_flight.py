@@ -0,0 +1,64 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+When a double-click or a retried request sends the same prompt to the same
+model while the first call is still waiting on Gemini, the second caller
+waits for that call and gets its result (or its error) instead of
+spending quota on a duplicate request.
+Nothing is cached: once a call finishes, the next identical call goes
+upstream again.
+"""
+import copy
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+import metrics
+
+
+def prompt_fingerprint(prompt) -> str:
+    """SHA-256 of the text of a prompt string, PromptValue or message list"""
+    if isinstance(prompt, str):
+        text = prompt
+    elif isinstance(prompt, (list, tuple)):
+        text = "\x1e".join(f"{getattr(message, 'type', '')}:{getattr(message, 'content', message)}"
+                           for message in prompt)
+    elif hasattr(prompt, "to_string"):
+        text = prompt.to_string()
+    else:
+        text = str(prompt)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() unless an identical call is in flight; either way return its result"""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+
+        metrics.inc("single_flight_calls_total", group=self.name, role="leader" if leader else "merged")
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.calls[key]
+        else:
+            print(f"🔗 Joining identical in-flight {self.name} call")
+
+        # Every caller gets its own copy: the pipeline edits results in place
+        return copy.deepcopy(future.result())
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return len(self.calls)
@@ -66,16 +66,30 @@ export async function POST(request: NextRequest) {
         // const backendUrl = process.env.FASTAPI_BACKEND_URL || "http://localhost:8503/";
     console.log("🚀 Forwarding request to FastAPI backend...")
 
-    // Forward the entire form data to FastAPI backend
+    // Forward the entire form data to FastAPI backend, with the idempotency key so
+    // a retry resumes from the stages the backend already completed
+    const idempotencyKey = request.headers.get("Idempotency-Key")
     const response = await fetch(`${backendUrl}api/process-resume`, {
       method: "POST",
+      headers: idempotencyKey ? { "Idempotency-Key": idempotencyKey } : undefined,
       body: formData,
     })
 
     if (!response.ok) {
       const errorText = await response.text()
       console.error(`Backend error: ${response.status} - ${errorText}`)
-      
+
+      // Backend is at capacity (admission control) - pass the 429 and Retry-After through
+      if (response.status === 429 && !isQuotaExceededError(errorText)) {
+        return new NextResponse(errorText, {
+          status: 429,
+          headers: {
+            "Content-Type": "application/json",
+            "Retry-After": response.headers.get("Retry-After") || "5",
+          },
+        })
+      }
+
       // Check if this is a quota exceeded error
       if (isQuotaExceededError(errorText)) {
         console.log(`🚨 Quota exceeded detected for ${selectedServer}`)
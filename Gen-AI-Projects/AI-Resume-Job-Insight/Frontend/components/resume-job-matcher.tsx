@@ -231,6 +231,12 @@ export function ResumeJobMatcher() {
           return
         }
         
+        // Backend still at capacity after the automatic retries - not a quota problem
+        if (result.error_type === "server_busy") {
+          setError(result.message || "Server is busy. Please try again shortly.")
+          return
+        }
+        
         // Check for validation errors (like empty job description)
         if (result.error_type === "validation_error") {
           setError(result.error || "Please provide a valid job description")
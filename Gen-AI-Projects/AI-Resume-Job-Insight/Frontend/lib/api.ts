@@ -33,6 +33,7 @@ export interface ProcessResumeResponse {
   job_data?: any     // Contains parsed job description
   comparison_result?: any  // Contains the main comparison analysis
   visualization_data?: any // Contains visualization data
+  routing?: any  // Model chosen per stage (selectedServer "auto")
   // Quota-related properties
   quotaExceeded?: boolean
   serverRestarted?: boolean
@@ -46,6 +47,7 @@ export interface ProcessResumeResponse {
   alternative_servers?: string[]
   estimated_restart_time?: string
   suggestion?: string
+  retry_after?: number  // Seconds to wait when error_type is "server_busy"
 }
 
 export interface GenerateResumeResponse {
@@ -55,6 +57,32 @@ export interface GenerateResumeResponse {
   suggestions?: string[]
 }
 
+// One idempotency key per distinct submission: retrying the same resume and job
+// description reuses it, so the backend resumes from its checkpointed stages
+const idempotencyKeys = new Map<string, string>()
+
+function idempotencyKeyFor(resumeFile: File, jobDescription: string, jobUrl?: string): string {
+  const submission = [resumeFile.name, resumeFile.size, resumeFile.lastModified, jobDescription, jobUrl || ""].join("\u0000")
+  let key = idempotencyKeys.get(submission)
+  if (!key) {
+    key = typeof crypto !== "undefined" && "randomUUID" in crypto
+      ? crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+    idempotencyKeys.set(submission, key)
+  }
+  return key
+}
+
+// A "server_busy" 429 means the backend's analysis queue is full, not that a
+// quota ran out: wait as long as its Retry-After says and send the request again
+const MAX_BUSY_RETRIES = 3
+const MAX_BUSY_WAIT_SECONDS = 60
+
+function retryAfterSeconds(response: Response, datares: any): number {
+  const seconds = Number(response.headers.get("Retry-After") ?? datares?.retry_after)
+  return Number.isFinite(seconds) && seconds > 0 ? Math.min(seconds, MAX_BUSY_WAIT_SECONDS) : 5
+}
+
 /**
  * Process resume and job description to get match analysis
  */
@@ -74,13 +102,36 @@ export async function processResume(
     if (selectedServer) {
       formData.append("selectedServer", selectedServer)
     }
+    const idempotencyKey = idempotencyKeyFor(resumeFile, jobDescription, jobUrl)
+    formData.append("idempotencyKey", idempotencyKey)
 
-    const response = await fetch("/api/process-resume", {
-      method: "POST",
-      body: formData,
-    })
+    let response: Response
+    let datares: any
+    for (let attempt = 0; ; attempt++) {
+      response = await fetch("/api/process-resume", {
+        method: "POST",
+        headers: { "Idempotency-Key": idempotencyKey },
+        body: formData,
+      })
+      datares = await response.json()
+      if (response.status !== 429 || datares.error_type !== "server_busy" || attempt >= MAX_BUSY_RETRIES) {
+        break
+      }
+      const seconds = retryAfterSeconds(response, datares)
+      console.log(`🚦 Server busy - retrying in ${seconds}s`)
+      await new Promise(resolve => setTimeout(resolve, seconds * 1000))
+    }
     
-    const datares = await response.json()
+    // Still busy after the retries: report it as such, not as a quota problem
+    if (response.status === 429 && datares.error_type === "server_busy") {
+      return {
+        success: false,
+        error: datares.error || "Server is busy processing other resumes.",
+        error_type: "server_busy",
+        retry_after: retryAfterSeconds(response, datares),
+        message: datares.message || "Server is busy. Please try again shortly."
+      }
+    }
     
     // Check for quota exceeded errors first, even if response is not ok
     if (!response.ok) {